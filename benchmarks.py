@@ -0,0 +1,135 @@
+import argparse
+import json
+import re
+import subprocess
+import sys
+import time
+
+'''
+Runs synthetic export benchmarks, each in a fresh Blender like tests.py does.
+The scenes are built by io_xplane2blender/tests/benchmark_helpers.py
+
+Save the results of a run with --output and compare a later run against them with --compare
+'''
+
+# Must be kept in sync with io_xplane2blender/tests/benchmark_helpers.py
+BENCHMARK_RESULT_PREFIX = "BENCHMARK RESULT: "
+
+# Keyword arguments of benchmark_helpers.BenchmarkInfo
+BENCHMARKS = [
+    {"name": "many_meshes",        "meshes": 1000},
+    {"name": "dense_meshes",       "meshes": 16, "subdivisions": 30},
+    {"name": "deep_bone_chain",    "meshes": 64, "bone_chain_depth": 64, "keyframes": 2},
+    {"name": "many_keyframes",     "meshes": 64, "keyframes": 60},
+    {"name": "many_materials",     "meshes": 256, "materials": 64},
+    {"name": "many_lights",        "meshes": 1, "lights": 500},
+    {"name": "lods",               "meshes": 400, "subdivisions": 4, "lods": 4},
+    {"name": "many_files",         "meshes": 320, "subdivisions": 8, "files": 16},
+    {"name": "many_files_parallel","meshes": 320, "subdivisions": 8, "files": 16, "parallel_export": True},
+]
+
+# Keyword arguments of benchmark_helpers.run_composite_benchmark, without repeats.
+# Normal and specular textures of size x size pixels are composited
+COMPOSITE_BENCHMARKS = [
+    {"name": "composite_256",      "size": 256},
+    {"name": "composite_1024",     "size": 1024},
+    {"name": "composite_2048",     "size": 2048},
+    {"name": "composite_4096",     "size": 4096},
+]
+
+def _make_argparse():
+    parser = argparse.ArgumentParser(description="Runs the XPlane2Blender export benchmarks")
+    parser.add_argument("-f", "--filter",
+            help="Only run benchmarks whose name matches a regular expression",
+            type=str)#[regex]
+    parser.add_argument("-r", "--repeats",
+            help="Number of times each export is timed",
+            default=3,
+            type=int)
+    parser.add_argument("-o", "--output",
+            help="Save the results as JSON to this file",
+            type=str)
+    parser.add_argument("--compare",
+            help="Compare the results against the JSON results of an earlier run",
+            type=str)
+    parser.add_argument("--blender",
+            default="blender",# Use the blender in the system path
+            type=str,
+            help="Provide alternative path to Blender executable")
+    return parser
+
+def run_benchmark(argv, benchmark, entry_point = "main")->dict:
+    blender_args = [
+        argv.blender,
+        '--addons',
+        'io_xplane2blender',
+        '--factory-startup',
+        '-noaudio',
+        '-b',
+        '--python-expr',
+        'from io_xplane2blender.tests import benchmark_helpers; benchmark_helpers.%s()' % entry_point,
+        '--',
+        json.dumps(dict(benchmark, repeats=argv.repeats))
+    ]
+
+    out = subprocess.check_output(blender_args, stderr = subprocess.STDOUT, universal_newlines=True) # type: str
+    for line in out.splitlines():
+        if line.startswith(BENCHMARK_RESULT_PREFIX):
+            return json.loads(line[len(BENCHMARK_RESULT_PREFIX):])
+
+    print(out)
+    raise RuntimeError("Benchmark %s did not print a result" % benchmark["name"])
+
+def print_result(result, previous = None, time_key = "export_time_min"):
+    line = "{name:<20} {time:>10.4f}s".format(name = result["info"]["name"], time = result[time_key])
+
+    if previous:
+        ratio = result[time_key] / previous[time_key]
+        line += "  was {time:>10.4f}s ({ratio:+.1%})".format(time = previous[time_key], ratio = ratio - 1)
+
+    print(line)
+
+    for phase, seconds in result["phases"].items():
+        line = "    {phase:<24} {time:>10.4f}s".format(phase = phase, time = seconds)
+
+        if previous and phase in previous["phases"]:
+            line += "  was {time:>10.4f}s".format(time = previous["phases"][phase])
+
+        print(line)
+
+def main(argv=None)->int:
+    if argv is None:
+        argv = _make_argparse().parse_args(sys.argv[1:])
+
+    previous_results = {}
+    if argv.compare:
+        with open(argv.compare) as f:
+            previous_results = {result["info"]["name"]: result for result in json.load(f)["results"]}
+
+    timer_start = time.perf_counter()
+    results = []
+    for benchmark in BENCHMARKS:
+        if argv.filter and not re.search(argv.filter, benchmark["name"]):
+            continue
+
+        result = run_benchmark(argv, benchmark)
+        results.append(result)
+        print_result(result, previous_results.get(benchmark["name"]))
+
+    for benchmark in COMPOSITE_BENCHMARKS:
+        if argv.filter and not re.search(argv.filter, benchmark["name"]):
+            continue
+
+        result = run_benchmark(argv, benchmark, entry_point = "composite_main")
+        results.append(result)
+        print_result(result, previous_results.get(benchmark["name"]), time_key = "composite_time_min")
+
+    if argv.output:
+        with open(argv.output, 'w') as f:
+            json.dump({"date": time.strftime("%Y-%m-%d %H:%M:%S"), "results": results}, f, indent = 4)
+
+    print("Ran {} benchmarks in {:.4f} seconds".format(len(results), time.perf_counter() - timer_start))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
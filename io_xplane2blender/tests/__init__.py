@@ -3,7 +3,7 @@ import shutil
 import sys
 import unittest
 
-from typing import Callable, List, Optional, Tuple, Union
+from typing import Callable, Dict, List, Optional, Tuple, Union
 
 import bpy
 
@@ -24,7 +24,10 @@ TEST_RESULTS_REGEX = "RESULT: After {num_tests} tests got {errors} errors, {fail
 FLOAT_TOLERANCE = 0.0001
 
 __dirname__ = os.path.dirname(__file__)
-TMP_DIR = os.path.realpath(os.path.join(__dirname__, '../../tests/tmp'))
+# tests.py --jobs gives each of its workers its own tmp folder, so their outputs can't collide
+# Must be kept in sync with XPlane2Blender/tests.py
+TMP_DIR_ENV_VAR = "XPLANE2BLENDER_TEST_TMP_DIR"
+TMP_DIR = os.path.realpath(os.environ.get(TMP_DIR_ENV_VAR) or os.path.join(__dirname__, '../../tests/tmp'))
 
 class XPlaneTestCase(unittest.TestCase):
     def setUp(self, useLogger = True):
@@ -337,6 +340,9 @@ class XPlaneAnimationTestCase(XPlaneTestCase):
 def make_fixture_path(dirname,filename,sub_dir=""):
     return os.path.join(dirname, 'fixtures', sub_dir, filename + '.obj')
 
+# The counts of the last runTestCases call, read by test_worker.py
+last_test_results = None # type: Optional[Dict[str,int]]
+
 def runTestCases(testCases):
     #Until a better solution for knowing if the logger's error count should be used to quit the testing,
     #we are currently saying only 1 is allow per suite at a time (which is likely how it should be anyways)
@@ -352,3 +358,11 @@ def runTestCases(testCases):
                 skipped=len(test_result.skipped))
     print(return_string)
 
+    global last_test_results
+    last_test_results = {
+        "testsRun": test_result.testsRun,
+        "errors": len(test_result.errors),
+        "failures": len(test_result.failures),
+        "skipped": len(test_result.skipped)
+    }
+
@@ -0,0 +1,255 @@
+import collections
+import json
+import math
+import os
+import statistics
+import sys
+import tempfile
+import time
+from typing import *
+
+import bpy
+from mathutils import Vector
+
+import io_xplane2blender
+from io_xplane2blender import xplane_constants, xplane_helpers, xplane_image_composer
+from io_xplane2blender.xplane_helpers import logger, profiler
+from io_xplane2blender.tests.test_creation_helpers import *
+
+'''
+benchmark_helpers
+
+Builds synthetic scenes from test_creation_helpers and times their export.
+
+Run by XPlane2Blender/benchmarks.py inside Blender, which passes a BenchmarkInfo as JSON after '--'
+and reads the result back from the line starting with BENCHMARK_RESULT_PREFIX.
+The texture compositing of xplane_image_composer is timed the same way by composite_main
+'''
+
+BENCHMARK_RESULT_PREFIX = "BENCHMARK RESULT: "
+
+BENCHMARK_DATAREF = "sim/graphics/animation/sin_wave_2"
+
+class BenchmarkInfo():
+    def __init__(self,
+            name:str,
+            meshes:int=1,
+            subdivisions:int=0,
+            bone_chain_depth:int=0,
+            keyframes:int=0,
+            materials:int=1,
+            lights:int=0,
+            lods:int=0,
+            files:int=1,
+            parallel_export:bool=False,
+            repeats:int=3):
+        '''
+        - meshes - Number of cubes, laid out in a grid
+        - subdivisions - Number of cuts each cube's edges are subdivided with, a cube gets 6*(subdivisions+1)^2 faces
+        - bone_chain_depth - If not 0, an armature with a chain of this many bones is created and the cubes are parented
+        to its bones, round robin
+        - keyframes - If at least 2, every bone is rotated (or every cube when there are no bones) over this many keyframes
+        - materials - Number of materials, assigned to the cubes round robin
+        - lights - Number of lamps
+        - lods - Number of levels of detail, the cubes are put into them round robin
+        - files - Number of OBJs, each exported from its own layer, the cubes are put into them round robin
+        - parallel_export - If the scene is exported with "Parallel Export"
+        - repeats - Number of times the export is timed
+        '''
+        assert meshes >= 0 and subdivisions >= 0 and bone_chain_depth >= 0 and keyframes >= 0
+        assert materials >= 1 and lights >= 0 and repeats >= 1
+        assert 0 <= lods < xplane_constants.MAX_LODS
+        assert 1 <= files <= 20
+        self.name = name
+        self.meshes = meshes
+        self.subdivisions = subdivisions
+        self.bone_chain_depth = bone_chain_depth
+        self.keyframes = keyframes
+        self.materials = materials
+        self.lights = lights
+        self.lods = lods
+        self.files = files
+        self.parallel_export = parallel_export
+        self.repeats = repeats
+
+    def to_dict(self)->Dict[str,Any]:
+        return dict(vars(self))
+
+def _make_keyframe_infos(keyframes:int)->List[KeyframeInfo]:
+    return [
+        KeyframeInfo(
+            idx=i+1,
+            dataref_path=BENCHMARK_DATAREF,
+            dataref_value=i / (keyframes-1),
+            rotation=(0, 0, 90 * i / (keyframes-1)))
+        for i in range(keyframes)
+    ]
+
+def create_benchmark_scene(info:BenchmarkInfo)->None:
+    '''
+    Replaces the current scene with the one described by info, exported as layers 1 to info.files
+    '''
+    create_initial_test_setup()
+    for i in range(info.files):
+        bpy.context.scene.layers[i] = True
+        set_xplane_layer(i, {"name": info.name if info.files == 1 else "{}_{}".format(info.name, i)})
+
+    material_names = ["Material_{}".format(i) for i in range(info.materials)]
+    for material_name in material_names:
+        create_material(material_name)
+
+    animate = info.keyframes >= 2
+    armature = None
+    if info.bone_chain_depth:
+        armature = create_datablock_armature(
+                DatablockInfo("ARMATURE", name="benchmark_armature"),
+                extra_bones=info.bone_chain_depth,
+                bone_direction=Vector((0, 0, 1)))
+
+        if animate:
+            for bone in armature.data.bones:
+                set_animation_data(bone, _make_keyframe_infos(info.keyframes), parent_armature=armature)
+
+    if info.lods:
+        for layer_index in range(info.files):
+            set_xplane_layer(layer_index, {"lods": str(info.lods)})
+            bpy.ops.scene.add_xplane_layer_lods(index=layer_index)
+            for i in range(info.lods):
+                lod = bpy.context.scene.xplane.layers[layer_index].lod[i]
+                lod.near = i * 1000
+                lod.far = (i + 1) * 1000
+
+    grid_size = max(1, math.ceil(math.sqrt(info.meshes)))
+    for i in range(info.meshes):
+        parent_info = None
+        if armature:
+            parent_info = ParentInfo(armature, "BONE", armature.data.bones[i % info.bone_chain_depth].name)
+
+        ob = create_datablock_mesh(
+                DatablockInfo(
+                    "MESH",
+                    name="mesh_{}".format(i),
+                    location=Vector(((i % grid_size) * 3, (i // grid_size) * 3, 0)),
+                    layers=tuple(layer == i % info.files for layer in range(20)),
+                    parent_info=parent_info),
+                material_name=material_names[i % info.materials])
+
+        if info.subdivisions:
+            bpy.context.scene.objects.active = ob
+            bpy.ops.object.mode_set(mode='EDIT')
+            bpy.ops.mesh.select_all(action='SELECT')
+            bpy.ops.mesh.subdivide(number_cuts=info.subdivisions)
+            bpy.ops.object.mode_set(mode='OBJECT')
+
+        if info.lods:
+            ob.xplane.lod[i % info.lods] = True
+
+        if animate and not armature:
+            set_animation_data(ob, _make_keyframe_infos(info.keyframes))
+
+    for i in range(info.lights):
+        create_datablock_lamp(
+                DatablockInfo(
+                    "LAMP",
+                    name="lamp_{}".format(i),
+                    location=Vector((i * 3, -3, 3))))
+
+    bpy.context.scene.frame_set(1)
+
+def run_benchmark(info:BenchmarkInfo)->Dict[str,Any]:
+    '''
+    Builds the scene for info, exports it info.repeats times and returns the timings in seconds.
+    The phases are those of the fastest export, see XPlaneProfiler
+    '''
+    start = time.perf_counter()
+    create_benchmark_scene(info)
+    setup_time = time.perf_counter() - start
+
+    bpy.context.scene.xplane.plugin_development = True
+    bpy.context.scene.xplane.dev_profile_export = True
+    bpy.context.scene.xplane.parallelExport = info.parallel_export
+
+    export_times = []
+    fastest_report = None
+    with tempfile.TemporaryDirectory() as export_dir:
+        # The profiler report is written next to the .blend, so it has to be saved
+        bpy.ops.wm.save_as_mainfile(filepath=os.path.join(export_dir, info.name + ".blend"))
+
+        for i in range(info.repeats):
+            logger.clear()
+            start = time.perf_counter()
+            bpy.ops.export.xplane_obj(filepath=os.path.join(export_dir, info.name + ".obj"))
+            export_times.append(time.perf_counter() - start)
+
+            assert not logger.hasErrors(), "Benchmark {} did not export without errors".format(info.name)
+
+            if export_times[-1] == min(export_times):
+                fastest_report = profiler.report()
+
+        obj_size = sum(os.path.getsize(os.path.join(export_dir, filename))
+                       for filename in os.listdir(export_dir) if filename.endswith(".obj"))
+
+    return {
+        "info": info.to_dict(),
+        "blender_version": bpy.app.version_string,
+        "xplane2blender_version": str(xplane_helpers.VerStruct.current()),
+        "vertices": sum(len(ob.data.vertices) for ob in bpy.data.objects if ob.type == "MESH"),
+        "obj_size": obj_size,
+        "setup_time": setup_time,
+        "export_times": export_times,
+        "export_time_min": min(export_times),
+        "export_time_mean": statistics.mean(export_times),
+        "phases": fastest_report["phases"]
+    }
+
+def run_composite_benchmark(name:str, size:int, repeats:int=3)->Dict[str,Any]:
+    '''
+    Composites generated normal and specular images of size x size pixels like
+    XPlaneHeader does, repeats times, and returns the fastest time of each composite in seconds
+    '''
+    assert size >= 1 and repeats >= 1
+    normal_image = bpy.data.images.new(name + "_normal", size, size, alpha=True)
+    normal_image.generated_type = "COLOR_GRID"
+    specular_image = bpy.data.images.new(name + "_specular", size, size, alpha=True)
+    specular_image.generated_type = "UV_GRID"
+
+    composites = [
+        ("normal without alpha", lambda: xplane_image_composer.normalWithoutAlpha(normal_image, name + "_nm")),
+        ("specular to grayscale", lambda: xplane_image_composer.specularToGrayscale(specular_image, name + "_spec")),
+        ("combine specular and normal", lambda: xplane_image_composer.combineSpecularAndNormal(specular_image, normal_image, name + "_nm_spec")),
+    ]
+
+    phases = collections.OrderedDict()
+    for composite_name, composite in composites:
+        times = []
+        for i in range(repeats):
+            start = time.perf_counter()
+            composite()
+            times.append(time.perf_counter() - start)
+
+        phases[composite_name] = min(times)
+
+    return {
+        "info": {"name": name, "size": size, "repeats": repeats},
+        "blender_version": bpy.app.version_string,
+        "xplane2blender_version": str(xplane_helpers.VerStruct.current()),
+        "composite_time_min": sum(phases.values()),
+        "phases": phases
+    }
+
+def main()->None:
+    '''
+    Entry point for benchmarks.py, runs the BenchmarkInfo given as JSON after '--'
+    and prints the result as JSON
+    '''
+    info = BenchmarkInfo(**json.loads(sys.argv[sys.argv.index('--') + 1]))
+    result = run_benchmark(info)
+    print(BENCHMARK_RESULT_PREFIX + json.dumps(result))
+
+def composite_main()->None:
+    '''
+    Entry point for benchmarks.py, runs the composite benchmark given as JSON after '--'
+    ({"name": str, "size": int, "repeats": int}) and prints the result as JSON
+    '''
+    result = run_composite_benchmark(**json.loads(sys.argv[sys.argv.index('--') + 1]))
+    print(BENCHMARK_RESULT_PREFIX + json.dumps(result))
@@ -316,6 +316,25 @@ def create_datablock_empty(info:DatablockInfo)->bpy.types.Object:
     
     return ob
 
+def create_datablock_lamp(info:DatablockInfo,
+        blender_lamp_type:str="POINT")->bpy.types.Object: #Must be "POINT", "SUN", "SPOT", "HEMI", or "AREA"
+    assert info.datablock_type == "LAMP"
+    bpy.ops.object.lamp_add(
+        type=blender_lamp_type,
+        location=info.location,
+        rotation=info.rotation,
+        layers=info.layers
+        )
+    ob = bpy.context.object
+    ob.name = info.name if info.name is not None else ob.name
+    ob.rotation_mode = info.rotation_mode
+    ob.scale = info.scale
+
+    if info.parent_info:
+        set_parent(ob,info.parent_info)
+
+    return ob
+
 def create_datablock_mesh(info:DatablockInfo,
                 primitive_shape="cube", #Must be "cube" or "cylinder" 
                 material_name:str="Material")->bpy.types.Object:
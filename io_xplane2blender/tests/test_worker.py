@@ -0,0 +1,62 @@
+import json
+import sys
+import traceback
+
+import bpy
+
+import io_xplane2blender.tests
+
+'''
+test_worker
+
+Runs test files in a long-lived Blender for XPlane2Blender/tests.py --persistent,
+saving the Blender startup and addon registration per test file.
+
+tests.py writes one JSON request per line to stdin: {"pyFile": path, "blendFile": path or null}.
+For each request the worker loads a clean state, runs the test file and prints a line
+starting with WORKER_RESULT_PREFIX followed by its counts as JSON.
+Everything printed before that line is the output of the test file.
+'''
+
+# Must be kept in sync with XPlane2Blender/tests.py
+WORKER_RESULT_PREFIX = "XPLANE2BLENDER WORKER RESULT: "
+
+def reset_state(blend_file):
+    '''
+    Gives a test file the same start as a fresh Blender would:
+    the .blend file if it has one or the factory startup file
+    '''
+    if blend_file:
+        bpy.ops.wm.open_mainfile(filepath=blend_file)
+    else:
+        bpy.ops.wm.read_homefile()
+
+def run_test_file(py_file, blend_file):
+    '''
+    Returns the counts of the test file's runTestCases call, an error if it never got there
+    '''
+    io_xplane2blender.tests.last_test_results = None
+
+    try:
+        reset_state(blend_file)
+
+        with open(py_file) as f:
+            code = compile(f.read(), py_file, 'exec')
+
+        exec(code, {"__name__": "__main__", "__file__": py_file})
+    except:
+        traceback.print_exc()
+
+    results = io_xplane2blender.tests.last_test_results
+    if results is None:
+        results = {"testsRun": 0, "errors": 1, "failures": 0, "skipped": 0}
+
+    return results
+
+def main():
+    for line in sys.stdin:
+        request = json.loads(line)
+        results = run_test_file(request["pyFile"], request["blendFile"])
+
+        sys.stderr.flush()
+        print(WORKER_RESULT_PREFIX + json.dumps(results), flush=True)
@@ -0,0 +1,235 @@
+# File: xplane_change_tracker.py
+# Keeps track of the Blender objects that changed since the last export, so
+# "Re-export Changed OBJs" only has to collect and write the OBJs they end up in.
+#
+# Changes are picked up by a scene_update_post handler. Objects, meshes, lamps, materials and
+# actions are tracked, changes of scene or layer settings are not.
+#
+# An OBJ counts as changed if a changed object is in it now or was in it at the last export,
+# so moving an object to another layer or root object re-exports both OBJs, see <markClean>.
+
+import bpy
+from bpy.app.handlers import persistent
+
+from typing import Dict, FrozenSet, Set
+
+# Property: changedObjectNames
+# set - Names of the Blender objects that changed since the last export
+changedObjectNames = set() # type: Set[str]
+
+# Property: _changedObjectPointers
+# set - as_pointer() of the changed objects, which unlike their names survives renames
+_changedObjectPointers = set() # type: Set[int]
+
+# Property: everythingChanged
+# bool - True if changes could not be attributed to single objects, i.e. after loading a file or an undo
+everythingChanged = True
+
+# Property: paused
+# bool - True while exporting, as the exporter changes frames and creates temporary objects
+paused = False
+
+_objectCount = 0
+
+# Property: _exportedLayers
+# dict - as_pointer() of each object to the indexes of the layers it was in at the last export
+_exportedLayers = {} # type: Dict[int, FrozenSet[int]]
+
+# Property: _exportedAncestors
+# dict - as_pointer() of each object to those of itself and its ancestors at the last export
+_exportedAncestors = {} # type: Dict[int, FrozenSet[int]]
+
+# Function: markEverythingChanged
+# Marks all OBJs as changed.
+def markEverythingChanged():
+    global everythingChanged
+    everythingChanged = True
+
+# Function: markClean
+# Forgets all changes, called after a successful export. Remembers which layers
+# and root objects each object was exported with, see <isLayerChanged> and <isRootObjectChanged>.
+def markClean():
+    global everythingChanged, _objectCount
+    everythingChanged = False
+    changedObjectNames.clear()
+    _changedObjectPointers.clear()
+    _exportedLayers.clear()
+    _exportedAncestors.clear()
+    _objectCount = len(bpy.data.objects)
+
+    for blenderObject in bpy.data.objects:
+        pointer = blenderObject.as_pointer()
+        _exportedLayers[pointer] = frozenset(i for i, inLayer in enumerate(blenderObject.layers) if inLayer)
+
+        ancestors = set()
+        while blenderObject:
+            ancestors.add(blenderObject.as_pointer())
+            blenderObject = blenderObject.parent
+        _exportedAncestors[pointer] = frozenset(ancestors)
+
+# Function: markObjectChanged
+# Marks an object as changed.
+#
+# Parameters:
+#   blenderObject - Blender object
+def markObjectChanged(blenderObject):
+    changedObjectNames.add(blenderObject.name)
+    _changedObjectPointers.add(blenderObject.as_pointer())
+
+def pause():
+    global paused
+    paused = True
+
+def resume():
+    global paused, _objectCount
+    paused = False
+    _objectCount = len(bpy.data.objects)
+
+# Function: isLayerChanged
+# Can be used as layerFilter of <createFilesFromBlenderLayers>.
+#
+# Parameters:
+#   int layerIndex - Index of the Blender layer
+#   list blenderObjects - Objects exported with this layer, see <getBlenderObjectsByLayerIndex>
+#
+# Returns:
+#   bool - True if one of the objects or an object that was in the layer at the last export changed since
+def isLayerChanged(layerIndex, blenderObjects)->bool:
+    if everythingChanged:
+        return True
+
+    changedObjects = _getChangedObjects()
+
+    for blenderObject in blenderObjects:
+        if blenderObject.as_pointer() in changedObjects:
+            return True
+
+    for pointer in changedObjects:
+        if layerIndex in _exportedLayers.get(pointer, ()):
+            return True
+
+    return False
+
+# Function: isRootObjectChanged
+# Can be used as rootObjectFilter of <createFilesFromBlenderRootObjects>.
+#
+# Parameters:
+#   rootObject - Exportable root object
+#
+# Returns:
+#   bool - True if the root object, one of its descendants or an object that descended
+#   from it at the last export changed since
+def isRootObjectChanged(rootObject)->bool:
+    if everythingChanged:
+        return True
+
+    rootPointer = rootObject.as_pointer()
+
+    for pointer, blenderObject in _getChangedObjects().items():
+        if rootPointer in _exportedAncestors.get(pointer, ()):
+            return True
+
+        while blenderObject:
+            if blenderObject == rootObject:
+                return True
+            blenderObject = blenderObject.parent
+
+    return False
+
+# Function: _getChangedObjects
+#
+# Returns:
+#   dict - as_pointer() of each changed object to the object
+def _getChangedObjects()->Dict[int, bpy.types.Object]:
+    changedObjects = {}
+
+    for name in changedObjectNames:
+        blenderObject = bpy.data.objects.get(name)
+
+        if blenderObject:
+            changedObjects[blenderObject.as_pointer()] = blenderObject
+
+    # renamed since they changed, deleted objects mark everything changed
+    if not _changedObjectPointers.issubset(changedObjects):
+        for blenderObject in bpy.data.objects:
+            pointer = blenderObject.as_pointer()
+
+            if pointer in _changedObjectPointers:
+                changedObjects[pointer] = blenderObject
+
+    return changedObjects
+
+def _getUpdatedDataPointers():
+    pointers = set()
+
+    for collection in (bpy.data.meshes, bpy.data.lamps, bpy.data.materials, bpy.data.actions):
+        if collection.is_updated:
+            for data in collection:
+                if data.is_updated or data.is_updated_data:
+                    pointers.add(data.as_pointer())
+
+    return pointers
+
+def _usesUpdatedData(blenderObject, pointers)->bool:
+    if blenderObject.data and blenderObject.data.as_pointer() in pointers:
+        return True
+
+    if blenderObject.animation_data and blenderObject.animation_data.action and \
+        blenderObject.animation_data.action.as_pointer() in pointers:
+        return True
+
+    for slot in blenderObject.material_slots:
+        if slot.material and slot.material.as_pointer() in pointers:
+            return True
+
+    return False
+
+@persistent
+def scene_update_handler(scene):
+    global _objectCount
+
+    if paused or everythingChanged:
+        return
+
+    objects = bpy.data.objects
+
+    if objects.is_updated:
+        # objects were deleted, we don't know which OBJs they were in anymore
+        if len(objects) < _objectCount:
+            markEverythingChanged()
+            return
+
+        _objectCount = len(objects)
+        groupPointers = set()
+
+        for blenderObject in objects:
+            if blenderObject.is_updated or blenderObject.is_updated_data:
+                markObjectChanged(blenderObject)
+
+                for group in blenderObject.users_group:
+                    groupPointers.add(group.as_pointer())
+
+        # group instances are exported as copies of the group's objects
+        if groupPointers:
+            for blenderObject in objects:
+                if blenderObject.dupli_group and blenderObject.dupli_group.as_pointer() in groupPointers:
+                    markObjectChanged(blenderObject)
+
+    pointers = _getUpdatedDataPointers()
+
+    if pointers:
+        for blenderObject in objects:
+            if blenderObject.name not in changedObjectNames and _usesUpdatedData(blenderObject, pointers):
+                markObjectChanged(blenderObject)
+
+@persistent
+def load_handler(dummy):
+    changedObjectNames.clear()
+    _changedObjectPointers.clear()
+    markEverythingChanged()
+
+bpy.app.handlers.scene_update_post.append(scene_update_handler)
+bpy.app.handlers.load_post.append(load_handler)
+# Undo and redo reload all datablocks, so their changes aren't flagged and their pointers change
+bpy.app.handlers.undo_post.append(load_handler)
+bpy.app.handlers.redo_post.append(load_handler)
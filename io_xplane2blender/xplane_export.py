@@ -1,13 +1,17 @@
 # File: xplane_export.py
 # Defines Classes used to create OBJ files out of XPlane data types defined in <xplane_types.py>.
 
+import concurrent.futures
+import io
+import multiprocessing
 import os.path
 import bpy
 import mathutils
 import os
 import sys
-from .xplane_helpers import XPlaneLogger, logger
+from .xplane_helpers import XPlaneLogger, logger, pathCache, profiler, replaceFile
 from .xplane_types import xplane_file
+from . import xplane_change_tracker, xplane_image_composer
 from .xplane_config import getDebug
 from bpy_extras.io_utils import ImportHelper, ExportHelper
 import io_xplane2blender
@@ -46,6 +50,11 @@ class ExportXPlane(bpy.types.Operator, ExportHelper):
         description="Set to true when starting the export via the button (with or without the GUI on in case of unit testing)",
         default=False)
 
+    only_changed = bpy.props.BoolProperty(
+        name = "Only Changed",
+        description = "Only export OBJs containing objects that changed since the last export",
+        default=False)
+
     # Method: execute
     # Used from Blender when user invokes export.
     # Invokes the exporting.
@@ -53,6 +62,56 @@ class ExportXPlane(bpy.types.Operator, ExportHelper):
     # Parameters:
     #   context - Blender context object.
     def execute(self, context):
+        # the export changes frames and creates temporary objects, none of which are changes by the user
+        xplane_change_tracker.pause()
+        profiler.start(bpy.context.scene.xplane.plugin_development and \
+                       bpy.context.scene.xplane.dev_profile_export)
+        xplane_image_composer.startImageIndex()
+        pathCache.start()
+
+        try:
+            result = self._export(context)
+        finally:
+            # messages of an export that raised are still in the buffered log,
+            # and cancelled exports return without <_endLogging>
+            logger.flush()
+            logger.setMinLevel(None)
+            xplane_change_tracker.resume()
+            profiled = profiler.enabled
+            profiler.stop()
+            xplane_image_composer.stopImageIndex()
+            pathCache.stop()
+
+        if result == {'FINISHED'} and not logger.hasErrors() and not self._isDryRun():
+            xplane_change_tracker.markClean()
+
+        if profiled:
+            self._writeProfilerReport()
+
+        return result
+
+    # Method: _writeProfilerReport
+    # Writes the timings of <profiler> as JSON next to the .blend file.
+    def _writeProfilerReport(self):
+        if bpy.context.blend_data.filepath == '':
+            logger.warn("Cannot write profiler report if .blend file is not saved")
+        else:
+            filepath = os.path.splitext(bpy.context.blend_data.filepath)[0] + '_xplane2blender_profile.json'
+
+            try:
+                profiler.writeReport(filepath)
+                logger.info("Wrote profiler report %s", filepath)
+            except OSError as e:
+                logger.error(e)
+
+        logger.flush()
+
+    # Method: _export
+    # Collects and writes all <XPlaneFiles>, see <execute>.
+    #
+    # Parameters:
+    #   context - Blender context object.
+    def _export(self, context):
         # prepare logging
         self._startLogging()
         
@@ -107,24 +166,31 @@ class ExportXPlane(bpy.types.Operator, ExportHelper):
         xplaneFiles = []
 
         if exportMode == 'layers':
-            xplaneFiles = xplane_file.createFilesFromBlenderLayers()
+            layerFilter = xplane_change_tracker.isLayerChanged if self.only_changed else None
+            xplaneFiles = xplane_file.createFilesFromBlenderLayers(layerFilter)
 
         elif exportMode == 'root_objects':
-            xplaneFiles = xplane_file.createFilesFromBlenderRootObjects(bpy.context.scene)
+            rootObjectFilter = xplane_change_tracker.isRootObjectChanged if self.only_changed else None
+            xplaneFiles = xplane_file.createFilesFromBlenderRootObjects(bpy.context.scene, rootObjectFilter)
 
-        for xplaneFile in xplaneFiles:
-            if self._writeXPlaneFile(xplaneFile, export_directory) == False:
-                if logger.hasErrors():
-                    self._endLogging()
-                    showLogDialog()
+        self.writtenFiles = 0
+        self.skippedFiles = 0
 
-                if bpy.context.scene.xplane.plugin_development and \
-                    bpy.context.scene.xplane.dev_continue_export_on_error:
-                    logger.info("Continuing export despite error in %s" % xplaneFile.filename)
-                    logger.clearMessages()
-                    continue
-                else:
-                    return {'CANCELLED'}
+        parallel = bpy.context.scene.xplane.parallelExport
+        if parallel and not self._canWriteInParallel():
+            logger.info("Parallel Export is not supported on this platform, writing one OBJ after the other")
+            parallel = False
+
+        if parallel:
+            if self._writeXPlaneFilesParallel(xplaneFiles, export_directory) == False:
+                return {'CANCELLED'}
+        else:
+            for xplaneFile in xplaneFiles:
+                if self._writeXPlaneFile(xplaneFile, export_directory) == False:
+                    if self._continueAfterError(xplaneFile):
+                        continue
+                    else:
+                        return {'CANCELLED'}
 
         # return to stored frame
         bpy.context.scene.frame_set(frame = currentFrame)
@@ -134,6 +200,8 @@ class ExportXPlane(bpy.types.Operator, ExportHelper):
         #if logger.hasErrors() or logger.hasWarnings():
             #showLogDialog()
 
+        logger.success("Wrote %d file(s), skipped %d unchanged file(s)", self.writtenFiles, self.skippedFiles)
+
         if not logger.hasErrors():
             logger.success("Export finished without errors")
 
@@ -142,7 +210,7 @@ class ExportXPlane(bpy.types.Operator, ExportHelper):
 
     def _startLogging(self):
         debug = getDebug()
-        logLevels = ['error', 'warning']
+        logLevels = ['error', 'warning', 'success']
 
         self.logFile = None
 
@@ -152,10 +220,13 @@ class ExportXPlane(bpy.types.Operator, ExportHelper):
         # in debug mode, we log everything
         if debug:
             logLevels.append('info')
-            logLevels.append('success')
+            logger.setMinLevel(None)
+        else:
+            # nothing listens for lower levels, so don't even format them
+            logger.setMinLevel('success')
 
         # always log to internal text file and console
-        logger.addTransport(XPlaneLogger.InternalTextTransport('xplane2blender.log'), logLevels)
+        logger.addTransport(XPlaneLogger.InternalTextTransport('xplane2blender.log', buffered = True), logLevels)
         logger.addTransport(XPlaneLogger.ConsoleTransport(), logLevels)
 
         # log out to a file if logging is enabled
@@ -169,16 +240,44 @@ class ExportXPlane(bpy.types.Operator, ExportHelper):
                 logger.error("Cannot create log file if .blend file is not saved")
 
     def _endLogging(self):
+        logger.flush()
+        # the logger is global, let everything after the export log every level again
+        logger.setMinLevel(None)
+
         if self.logFile:
             self.logFile.close()
 
-    def _writeXPlaneFile(self, xplaneFile, dir):
-        debug = getDebug()
+    # Method: _continueAfterError
+    # Shows the log after an OBJ could not be exported and decides if the export goes on.
+    #
+    # Parameters:
+    #   XPlaneFile xplaneFile - The <XPlaneFile> that could not be exported
+    #
+    # Returns:
+    #   bool - True if the export should continue with the next file, False if it must be cancelled
+    def _continueAfterError(self, xplaneFile):
+        if logger.hasErrors():
+            self._endLogging()
+            showLogDialog()
 
-        # only write layers that contain objects
-        if len(xplaneFile.objects) == 0:
-            return
-        
+        if bpy.context.scene.xplane.plugin_development and \
+            bpy.context.scene.xplane.dev_continue_export_on_error:
+            logger.info("Continuing export despite error in %s" % xplaneFile.filename)
+            logger.clearMessages()
+            return True
+
+        return False
+
+    # Method: _getXPlaneFilePath
+    # Returns the absolute path an <XPlaneFile> will be written to.
+    #
+    # Parameters:
+    #   XPlaneFile xplaneFile - The <XPlaneFile>
+    #   string dir - The export directory
+    #
+    # Returns:
+    #   string - The absolute path or None if the filename of the <XPlaneFile> is invalid
+    def _getXPlaneFilePath(self, xplaneFile, dir):
         if xplaneFile.filename.find('//') == 0:
             xplaneFile.filename = xplaneFile.filename.replace('//','',1)
         
@@ -187,7 +286,7 @@ class ExportXPlane(bpy.types.Operator, ExportHelper):
         
         if os.path.isabs(xplaneFile.filename):
             logger.error("Bad export path %s: File paths must be relative to the .blend file" % (xplaneFile.filename))
-            return False
+            return None
         
         #Get the relative path
         #Append .obj if needed
@@ -197,30 +296,158 @@ class ExportXPlane(bpy.types.Operator, ExportHelper):
         if not '.obj' in relpath:
             relpath += '.obj'
         
-        fullpath = os.path.abspath(os.path.join(os.path.dirname(bpy.context.blend_data.filepath),relpath))
-        out = xplaneFile.write()
-       
-        if logger.hasErrors():
+        return os.path.abspath(os.path.join(os.path.dirname(bpy.context.blend_data.filepath),relpath))
+
+    def _isDryRun(self):
+        return bpy.context.scene.xplane.plugin_development and \
+               bpy.context.scene.xplane.dev_export_as_dry_run
+
+    def _writeXPlaneFile(self, xplaneFile, dir):
+        debug = getDebug()
+
+        # only write layers that contain objects
+        if len(xplaneFile.objects) == 0:
+            return
+
+        fullpath = self._getXPlaneFilePath(xplaneFile, dir)
+        if fullpath is None:
+            return False
+
+        if not xplaneFile.prepareWrite() or logger.hasErrors():
             return False
 
         # write the file
-        if (bpy.context.scene.xplane.plugin_development is False) or \
-            (bpy.context.scene.xplane.plugin_development and         \
-             bpy.context.scene.xplane.dev_export_as_dry_run is False):
+        if not self._isDryRun():
+            # Stream into a temporary file next to the real one and only
+            # replace the real one if the whole OBJ could be written
+            tmppath = fullpath + '.tmp'
+            objFile = None
             try:
-                os.makedirs(os.path.dirname(fullpath),exist_ok=True)
-                objFile = open(fullpath, "w")
+                with profiler.phase(xplaneFile, 'io'):
+                    os.makedirs(os.path.dirname(fullpath),exist_ok=True)
+                    objFile = open(tmppath, "w")
+
                 logger.info("Writing %s" % fullpath)
-                objFile.write(out)
-                logger.success("Wrote %s" % fullpath)
+                xplaneFile.writeTo(objFile)
+
+                with profiler.phase(xplaneFile, 'io'):
+                    objFile.close()
+                    objFile = None
+
+                if logger.hasErrors():
+                    return False
+
+                with profiler.phase(xplaneFile, 'io'):
+                    written = replaceFile(tmppath, fullpath, bpy.context.scene.xplane.skipUnchangedFiles)
+
+                self._logWriteResult(fullpath, written)
             except Exception as e:
                 logger.error(e)
             finally:
                 if objFile != None:
                     objFile.close()
+                if os.path.exists(tmppath):
+                    os.remove(tmppath)
         else:
+            xplaneFile.writeTo(io.StringIO())
+
+            if logger.hasErrors():
+                return False
+
             logger.info('Skipped writing %s due to "Dry Run"' % (fullpath))
 
+    # Method: _logWriteResult
+    # Logs and counts a written or skipped OBJ.
+    #
+    # Parameters:
+    #   string fullpath - The absolute path of the OBJ file
+    #   bool written - False if the file was skipped because it was unchanged
+    def _logWriteResult(self, fullpath, written):
+        if written:
+            self.writtenFiles += 1
+            logger.success("Wrote %s", fullpath)
+        else:
+            self.skippedFiles += 1
+            logger.info("Skipped writing unchanged %s", fullpath)
+
+    # Method: _canWriteInParallel
+    # The add-on imports bpy, so pool processes can't import it on their own. Forked processes
+    # already have it loaded, spawned ones (Windows) would start another Blender, see sys.executable.
+    #
+    # Returns:
+    #   bool - True if <_writeXPlaneFilesParallel> can be used
+    def _canWriteInParallel(self):
+        return multiprocessing.get_start_method() == 'fork'
+
+    # Method: _writeXPlaneFilesParallel
+    # Exports all <XPlaneFiles>, formatting and writing finished files in a process pool
+    # while the next ones are collected.
+    #
+    # Collecting a file and rendering the parts that need bpy happens on the main thread,
+    # see <XPlaneFile.snapshot>. The mesh tables, which are most of an OBJ, are formatted
+    # and written by <writeSnapshot> in other processes, so with enough cores the export
+    # takes about as long as collecting everything plus writing the largest OBJ.
+    #
+    # Parameters:
+    #   list xplaneFiles - The <XPlaneFiles> to export
+    #   string dir - The export directory
+    #
+    # Returns:
+    #   bool - False if the export must be cancelled
+    def _writeXPlaneFilesParallel(self, xplaneFiles, dir):
+        with concurrent.futures.ProcessPoolExecutor() as pool:
+            jobs = []
+
+            # The logger and profiler only exist in this process, so results are only logged here
+            def logResults():
+                for xplaneFile, fullpath, job in jobs:
+                    if job.cancelled():
+                        continue
+                    try:
+                        written, seconds = job.result()
+                        if profiler.enabled:
+                            profiler.add(xplaneFile, 'serialization and io', seconds)
+                        self._logWriteResult(fullpath, written)
+                    except Exception as e:
+                        logger.error(e)
+
+            # Jobs that already run or are done can't be cancelled
+            # and are still waited for, so their results are logged too
+            def cancel():
+                for xplaneFile, fullpath, job in jobs:
+                    job.cancel()
+                logResults()
+                return False
+
+            for xplaneFile in xplaneFiles:
+                # only write layers that contain objects
+                if len(xplaneFile.objects) == 0:
+                    continue
+
+                fullpath = self._getXPlaneFilePath(xplaneFile, dir)
+                if fullpath is None or not xplaneFile.prepareWrite() or logger.hasErrors():
+                    if self._continueAfterError(xplaneFile):
+                        continue
+                    return cancel()
+
+                snapshot = xplaneFile.snapshot()
+                if logger.hasErrors():
+                    if self._continueAfterError(xplaneFile):
+                        continue
+                    return cancel()
+
+                if self._isDryRun():
+                    logger.info('Skipped writing %s due to "Dry Run"' % (fullpath))
+                    continue
+
+                logger.info("Writing %s" % fullpath)
+                job = pool.submit(xplane_file.writeSnapshot, snapshot, fullpath, bpy.context.scene.xplane.skipUnchangedFiles)
+                jobs.append((xplaneFile, fullpath, job))
+
+            logResults()
+
+        return True
+
 
     # Method: invoke
     # Used from Blender when user hits the Export-Entry in the File>Export menu.
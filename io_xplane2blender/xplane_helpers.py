@@ -5,10 +5,16 @@ from typing import Optional
 import bpy
 import mathutils
 
+import collections
+import contextlib
 import datetime
 from datetime import timezone
+import filecmp
+import hashlib
+import json
 import os
 import re
+import time
 
 import io_xplane2blender
 from io_xplane2blender import xplane_config
@@ -49,6 +55,84 @@ def resolveBlenderPath(path:str)->str:
     else:
         return path
  
+# Function: getCanonicalPath
+# Returns the normalized absolute path of a file chosen by the user,
+# so the same file always gets the same path. Memoized during an export, see <XPlanePathCache>.
+#
+# Parameters:
+#   string path - Relative (to the .blend, with or without the leading '//') or absolute path
+#   string blenddir - Absolute path of the directory the .blend file is in
+#
+# Returns:
+#   string - The normalized absolute path
+def getCanonicalPath(path:str, blenddir:str)->str:
+    return pathCache.resolve((path, blenddir, None), _canonicalizePath, path, blenddir)
+
+def _canonicalizePath(path:str, blenddir:str)->str:
+    # blender stores relative paths on UNIX with leading double slash
+    if path[0:2] == '//':
+        path = path[2:]
+
+    if os.path.isabs(path):
+        return os.path.abspath(os.path.normpath(path))
+    else:
+        return os.path.abspath(os.path.normpath(os.path.join(blenddir, path)))
+
+# Function: getRelativePath
+# Returns the path of a file chosen by the user relative to the export directory, as written to the OBJ.
+# Memoized during an export, see <XPlanePathCache>.
+#
+# Parameters:
+#   string path - Relative (to the .blend) or absolute path, see <getCanonicalPath>
+#   string exportdir - Absolute path of the export directory
+#   string blenddir - Absolute path of the directory the .blend file is in
+#
+# Returns:
+#   string - The relative path with '/' as separator
+def getRelativePath(path:str, exportdir:str, blenddir:str)->str:
+    return pathCache.resolve((path, blenddir, exportdir), _relativizePath, path, exportdir, blenddir)
+
+def _relativizePath(path:str, exportdir:str, blenddir:str)->str:
+    path = os.path.relpath(getCanonicalPath(path, blenddir), exportdir)
+
+    #Replace any \ separators if you're on Windows. For other platforms this does nothing
+    return path.replace("\\","/")
+
+# Function: replaceFile
+# Moves a freshly written temporary file over its destination.
+#
+# Parameters:
+#   string tmppath - The temporary file
+#   string filepath - The destination
+#   bool onlyIfChanged - If True and the destination already has the same content, it is left untouched
+#
+# Returns:
+#   bool - True if the destination was replaced, False if it was unchanged
+def replaceFile(tmppath:str, filepath:str, onlyIfChanged:bool = False)->bool:
+    if onlyIfChanged and os.path.isfile(filepath) and filecmp.cmp(tmppath, filepath, shallow = False):
+        os.remove(tmppath)
+        return False
+
+    os.replace(tmppath, filepath)
+    return True
+
+# Function: getFileHash
+# Hashes the content of a file, unlike its mtime the hash survives checkouts and copies.
+#
+# Parameters:
+#   string filepath - The file
+#
+# Returns:
+#   string - SHA-1 hex digest of the file's content
+def getFileHash(filepath:str)->str:
+    sha1 = hashlib.sha1()
+
+    with open(filepath, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            sha1.update(chunk)
+
+    return sha1.hexdigest()
+
 def get_plugin_resources_folder()->str:
     return os.path.join(os.path.dirname(__file__),"resources")
 
@@ -277,10 +361,21 @@ class VerStruct():
 message_to_str_count = 0
 
 class XPlaneLogger():
+    # Property: levels
+    # dict - Rank of each message type, used by <setMinLevel>
+    levels = {
+        'info': 0,
+        'success': 1,
+        'warning': 2,
+        'error': 3
+    }
+
     def __init__(self):
         self.transports = []
         self.messages = []
-        
+        self.counts = {}
+        self.minLevel = None
+
     def addTransport(self, transport, messageTypes = ['error', 'warning', 'info', 'success']):
         self.transports.append({
             'fn': transport,
@@ -290,12 +385,46 @@ class XPlaneLogger():
     def clear(self):
         self.clearTransports()
         self.clearMessages()
+        self.setMinLevel(None)
 
     def clearTransports(self):
+        self.flush()
         del self.transports[:]
 
+    # Method: flush
+    # Flushes all transports that buffer their messages, see <InternalTextTransport>.
+    def flush(self):
+        for transport in self.transports:
+            flush = getattr(transport['fn'], 'flush', None)
+
+            if flush:
+                flush()
+
     def clearMessages(self):
         del self.messages[:]
+        self.counts.clear()
+
+    # Method: setMinLevel
+    # Messages of a type ranked below the given one are dropped before they
+    # are formatted, stored or sent to any transport.
+    #
+    # Parameters:
+    #   string messageType - 'info', 'success', 'warning', 'error' or None to keep everything.
+    def setMinLevel(self, messageType):
+        if messageType is None:
+            self.minLevel = None
+        else:
+            self.minLevel = self.levels[messageType]
+
+    # Method: isEnabledFor
+    #
+    # Parameters:
+    #   string messageType
+    #
+    # Returns:
+    #   bool - True if messages of messageType would be kept.
+    def isEnabledFor(self, messageType):
+        return self.minLevel is None or self.levels.get(messageType, self.minLevel) >= self.minLevel
 
     def messagesToString(self, messages = None):
         if messages == None:
@@ -308,30 +437,51 @@ class XPlaneLogger():
 
         return out
 
-    def log(self, messageType, message, context = None):
+    # Method: log
+    #
+    # Parameters:
+    #   string messageType
+    #   string message - Message, or a %-format string when args are given.
+    #   args - Formatted into message only if the message is kept.
+    #   context - Optional, keyword only.
+    def log(self, messageType, message, *args, context = None):
+        if not self.isEnabledFor(messageType):
+            return
+
+        if args:
+            message = message % args
+
         self.messages.append({
             'type': messageType,
             'message': message,
             'context': context
         })
+        self.counts[messageType] = self.counts.get(messageType, 0) + 1
 
         for transport in self.transports:
             if messageType in transport['types']:
                 transport['fn'](messageType, message, context)
 
-    def error(self, message, context = None):
-        self.log('error', message, context)
+        # don't keep errors in a buffer, in case we never get to flush it
+        if messageType == 'error':
+            self.flush()
 
-    def warn(self, message, context = None):
-        self.log('warning', message, context)
+    def error(self, message, *args, context = None):
+        self.log('error', message, *args, context = context)
 
-    def info(self, message, context = None):
-        self.log('info', message, context)
+    def warn(self, message, *args, context = None):
+        self.log('warning', message, *args, context = context)
 
-    def success(self, message, context = None):
-        self.log('success', message, context)
+    def info(self, message, *args, context = None):
+        self.log('info', message, *args, context = context)
+
+    def success(self, message, *args, context = None):
+        self.log('success', message, *args, context = context)
 
     def findOfType(self, messageType):
+        if not self.counts.get(messageType):
+            return []
+
         messages = []
 
         for message in self.messages:
@@ -341,11 +491,7 @@ class XPlaneLogger():
         return messages
 
     def hasOfType(self, messageType):
-        for message in self.messages:
-            if message['type'] == messageType:
-                return True
-
-        return False
+        return self.counts.get(messageType, 0) > 0
 
     def findErrors(self):
         return self.findOfType('error')
@@ -367,8 +513,15 @@ class XPlaneLogger():
         io_xplane2blender.xplane_helpers.message_to_str_count += 1
         return '%s: %s' % (messageType.upper(), message)
 
+    # Method: InternalTextTransport
+    # Logs to a Blender text block.
+    #
+    # Parameters:
+    #   string name - Name of the text block, cleared on creation.
+    #   bool buffered - If True, messages are collected in memory and written to the text block
+    #   in one go when the transport's flush (see <flush>) is called, instead of once per message.
     @staticmethod
-    def InternalTextTransport(name = 'XPlane2Blender.log'):
+    def InternalTextTransport(name = 'XPlane2Blender.log', buffered = False):
         if bpy.data.texts.find(name) == -1:
             log = bpy.data.texts.new(name)
         else:
@@ -376,8 +529,23 @@ class XPlaneLogger():
 
         log.clear()
 
+        if not buffered:
+            def transport(messageType, message, context = None):
+                log.write(XPlaneLogger.messageToString(messageType, message, context) + '\n')
+
+            return transport
+
+        lines = []
+
         def transport(messageType, message, context = None):
-            log.write(XPlaneLogger.messageToString(messageType, message, context) + '\n')
+            lines.append(XPlaneLogger.messageToString(messageType, message, context) + '\n')
+
+        def flush():
+            if lines:
+                log.write(''.join(lines))
+                del lines[:]
+
+        transport.flush = flush
 
         return transport
 
@@ -400,3 +568,136 @@ class XPlaneLogger():
 
 logger = XPlaneLogger()
 
+# Class: XPlaneProfiler
+# Times the phases of an export per <XPlaneFile>, see <phase>.
+# Does nothing unless <start> was called with enabled = True.
+class XPlaneProfiler():
+    def __init__(self):
+        self.enabled = False
+        self.startTime = 0.0
+        self.endTime = 0.0
+        # <XPlaneFile> -> phase name -> seconds, in order of first appearance
+        self.timings = collections.OrderedDict()
+        # filename -> phase name -> seconds, filled by <stop> so no <XPlaneFile> outlives the export
+        self.files = collections.OrderedDict()
+
+    # Method: start
+    # Forgets all timings and starts timing a new export.
+    #
+    # Parameters:
+    #   bool enabled - If False <phase> does not time anything
+    def start(self, enabled):
+        self.enabled = enabled
+        self.timings.clear()
+        self.files.clear()
+        self.startTime = time.perf_counter()
+        self.endTime = self.startTime
+
+    # Method: stop
+    # Stops timing the export, the timings are now available through <report>.
+    def stop(self):
+        self.enabled = False
+        self.endTime = time.perf_counter()
+
+        for xplaneFile, timings in self.timings.items():
+            self.files[xplaneFile.filename] = timings
+
+        self.timings.clear()
+
+    def add(self, xplaneFile, name, seconds):
+        phases = self.timings.setdefault(xplaneFile, collections.OrderedDict())
+        phases[name] = phases.get(name, 0.0) + seconds
+
+    # Method: phase
+    # Context manager adding the time spent in its body to a phase of an <XPlaneFile>.
+    # Phases are not meant to be nested.
+    #
+    # Parameters:
+    #   XPlaneFile xplaneFile - The file the time is spent on
+    #   string name - Name of the phase
+    @contextlib.contextmanager
+    def phase(self, xplaneFile, name):
+        if not self.enabled:
+            yield
+            return
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(xplaneFile, name, time.perf_counter() - start)
+
+    # Method: report
+    #
+    # Returns:
+    #   dict - Total, per file and per phase timings in seconds, ready to be dumped as JSON
+    def report(self):
+        files = collections.OrderedDict()
+        phases = collections.OrderedDict()
+
+        for filename, timings in self.files.items():
+            files[filename] = collections.OrderedDict(timings)
+            files[filename]['total'] = sum(timings.values())
+
+            for name, seconds in timings.items():
+                phases[name] = phases.get(name, 0.0) + seconds
+
+        return collections.OrderedDict((
+            ('blend', bpy.context.blend_data.filepath),
+            ('total', self.endTime - self.startTime),
+            ('phases', phases),
+            ('files', files)
+        ))
+
+    # Method: writeReport
+    # Writes <report> as JSON.
+    #
+    # Parameters:
+    #   string filepath - Path of the JSON file
+    def writeReport(self, filepath):
+        with open(filepath, 'w') as reportFile:
+            json.dump(self.report(), reportFile, indent = 4)
+
+profiler = XPlaneProfiler()
+
+# Class: XPlanePathCache
+# Memoizes path resolution for the duration of an export, as the same few texture paths
+# are resolved for every object. Does nothing unless <start> was called.
+class XPlanePathCache():
+    def __init__(self):
+        self.enabled = False
+        # (path, blenddir, exportdir or None) -> resolved path
+        self.paths = {}
+
+    # Method: start
+    # Forgets all paths and starts memoizing, the .blend must not be moved until <stop>.
+    def start(self):
+        self.enabled = True
+        self.paths.clear()
+
+    # Method: stop
+    def stop(self):
+        self.enabled = False
+        self.paths.clear()
+
+    # Method: resolve
+    #
+    # Parameters:
+    #   tuple key - (path, blenddir, exportdir or None)
+    #   function resolver - Resolves the path if it isn't memoized yet, called with args
+    #
+    # Returns:
+    #   string - The resolved path
+    def resolve(self, key, resolver, *args):
+        if not self.enabled:
+            return resolver(*args)
+
+        resolved = self.paths.get(key)
+
+        if resolved is None:
+            resolved = self.paths[key] = resolver(*args)
+
+        return resolved
+
+pathCache = XPlanePathCache()
+
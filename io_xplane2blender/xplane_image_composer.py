@@ -1,22 +1,85 @@
+import os
+
 import bpy
 
+from .xplane_helpers import getCanonicalPath
+
+# Property: _imageIndexEnabled
+# bool - True while an export runs, see <startImageIndex>
+_imageIndexEnabled = False
+
+# Property: _imageIndex
+# dict - Canonical path of an image's file to the image, None until the first lookup
+_imageIndex = None
+
+# Function: startImageIndex
+# Lets <getImageByFilepath> use an index of bpy.data.images, built on its first lookup.
+# Called when an export starts, as images don't change during an export, apart from
+# the composites, see <indexImage>.
+def startImageIndex():
+    global _imageIndexEnabled, _imageIndex
+    _imageIndexEnabled = True
+    _imageIndex = None
+
+# Function: stopImageIndex
+# Forgets the index of <startImageIndex>, called when an export ends.
+def stopImageIndex():
+    global _imageIndexEnabled, _imageIndex
+    _imageIndexEnabled = False
+    _imageIndex = None
+
+# Function: indexImage
+# Adds an image to the index of <startImageIndex> after its filepath was set.
+#
+# Parameters:
+#   image - Blender image
+def indexImage(image):
+    if _imageIndex is not None and image.filepath:
+        _imageIndex.setdefault(getCanonicalPath(image.filepath, _getBlendDir()), image)
+
+def _getBlendDir():
+    return os.path.dirname(bpy.context.blend_data.filepath)
+
+def _buildImageIndex():
+    blenddir = _getBlendDir()
+    index = {}
+
+    for image in bpy.data.images:
+        # the first image with a path wins, like a search through bpy.data.images would
+        if image.filepath:
+            index.setdefault(getCanonicalPath(image.filepath, blenddir), image)
+
+    return index
+
+# Function: getImageByFilepath
+#
+# Parameters:
+#   string filepath - Relative (to the .blend) or absolute path, see <getCanonicalPath>
+#
+# Returns:
+#   The first image in bpy.data.images using that file or None
 def getImageByFilepath(filepath):
-    image = None
-    i = 0
+    global _imageIndex
 
-    while image == None and i < len(bpy.data.images):
-        if bpy.data.images[i].filepath == filepath:
-            image = bpy.data.images[i]
-        i += 1
+    if not filepath:
+        return None
 
-    return image
+    blenddir = _getBlendDir()
+    canonicalPath = getCanonicalPath(filepath, blenddir)
+
+    # outside of an export the images can change between lookups, and a single lookup
+    # is cheaper as a scan that stops at the first match than as a full index
+    if not _imageIndexEnabled:
+        for image in bpy.data.images:
+            if image.filepath and getCanonicalPath(image.filepath, blenddir) == canonicalPath:
+                return image
 
-def getImagePixels(image):
-    pixels = [0.0,0.0,0.0,1.0] * int((len(image.pixels) / 4))
-    #for i in range(0, len(image.pixels)):
-    #    pixels.append(image.pixels[i])
+        return None
 
-    return pixels
+    if _imageIndex is None:
+        _imageIndex = _buildImageIndex()
+
+    return _imageIndex.get(canonicalPath)
 
 def imageSizesEqual(a, b):
     return a.size[0] == b.size[0] and a.size[1] == b.size[1]
@@ -38,20 +101,32 @@ def getGeneratedImage(targetName, width, height, channels):
 
     return image
 
+# Function: composePixels
+# Fills an image with the RGB channels of one image and the red channel of another one as alpha.
+# All images must have the same size.
+#
+# Parameters:
+#   image - Blender image to fill
+#   colorImage - Blender image the RGB channels are taken from
+#   alphaImage - Blender image the alpha channel is taken from or None for an opaque image
+def composePixels(image, colorImage, alphaImage = None):
+    # One transfer in and out, every channel is copied by a single slice assignment.
+    # pixels only supports slices with a step of 1
+    pixels = list(colorImage.pixels[:])
+
+    if alphaImage:
+        pixels[3::4] = alphaImage.pixels[:][0::4]
+    else:
+        pixels[3::4] = [1.0] * (len(pixels) // 4)
+
+    image.pixels[:] = pixels
+
 def specularToGrayscale(specularImage, targetName):
     width = specularImage.size[0]
     height = specularImage.size[1]
     image = getGeneratedImage(targetName, width, height, 1)
 
-    pixels = getImagePixels(image)
-    specPixels = specularImage.pixels[:]
-
-    for pi in range(0, len(specularImage.pixels), 4):
-        for i in range(3):
-            pixels[pi + i] = specPixels[pi + i]
-        pixels[pi + 3] = 1.0
-
-    image.pixels = pixels
+    composePixels(image, specularImage)
 
     return image
 
@@ -60,15 +135,7 @@ def normalWithoutAlpha(normalImage, targetName):
     height = normalImage.size[1]
     image = getGeneratedImage(targetName, width, height, 3)
 
-    pixels = getImagePixels(image)
-    normalPixels = normalImage.pixels[:]
-
-    for pi in range(0, len(normalImage.pixels), 4):
-        for i in range(3):
-            pixels[pi + i] = normalPixels[pi + i]
-        pixels[pi + 3] = 1.0
-
-    image.pixels = pixels
+    composePixels(image, normalImage)
 
     return image
 
@@ -82,16 +149,6 @@ def combineSpecularAndNormal(specularImage, normalImage, targetName):
     height = specularImage.size[1]
     image = getGeneratedImage(targetName, width, height, 4)
 
-    pixels = getImagePixels(image)
-    normalPixels = normalImage.pixels[:]
-    specPixels = specularImage.pixels[:]
-
-    for pi in range(0, len(normalImage.pixels), 4):
-        for i in range(3):
-            pixels[pi + i] = normalPixels[pi + i]
-
-        pixels[pi + 3] = specPixels[pi]
-
-    image.pixels = pixels
+    composePixels(image, normalImage, specularImage)
 
     return image
@@ -647,6 +647,20 @@ class SCENE_OT_export_to_relative_dir(bpy.types.Operator):
         bpy.ops.export.xplane_obj(filepath=self.initial_dir, export_is_relative=True)
         return {'FINISHED'}
 
+# Class: SCENE_OT_export_changed_to_relative_dir
+# Like <SCENE_OT_export_to_relative_dir>, but only exports OBJs containing objects that changed since the last export
+class SCENE_OT_export_changed_to_relative_dir(bpy.types.Operator):
+    bl_label = 'Re-export Changed OBJs'
+    bl_idname = 'scene.export_changed_to_relative_dir'
+    bl_description = 'Exports OBJs relative to the .blend file, skipping those without changed objects since the last export. Changes to scene or layer settings are not detected, use "Export OBJs" after those'
+
+    #initial_dir that will be prepended to the path.
+    initial_dir = bpy.props.StringProperty()
+
+    def execute(self, context):
+        bpy.ops.export.xplane_obj(filepath=self.initial_dir, export_is_relative=True, only_changed=True)
+        return {'FINISHED'}
+
 
 class XPLANE_OT_CommandSearchToggle(bpy.types.Operator):
     '''
@@ -770,6 +784,7 @@ def addXPlaneOps():
     bpy.utils.register_class(OBJECT_OT_remove_xplane_material_condition)
     
     bpy.utils.register_class(SCENE_OT_export_to_relative_dir)
+    bpy.utils.register_class(SCENE_OT_export_changed_to_relative_dir)
 
     #See xplane_ops_dev.py
     #bpy.utils.register_class(SCENE_OT_dev_export_to_current_dir)
@@ -816,6 +831,7 @@ def removeXPlaneOps():
     bpy.utils.unregister_class(OBJECT_OT_remove_xplane_material_condition)
 
     bpy.utils.unregister_class(SCENE_OT_export_to_relative_dir)
+    bpy.utils.unregister_class(SCENE_OT_export_changed_to_relative_dir)
 
     bpy.utils.unregister_class(SCENE_OT_dev_layer_names_from_objects)
     bpy.utils.unregister_class(SCENE_OT_dev_rerun_updater)
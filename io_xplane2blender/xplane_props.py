@@ -1332,6 +1332,11 @@ class XPlaneSceneSettings(bpy.types.PropertyGroup):
         name        = 'Dry Run',
         description = 'Run exporter without actually writing .objs to disk',
         default = False)
+
+    dev_profile_export = bpy.props.BoolProperty(
+        name        = 'Profile Export',
+        description = 'Times each phase of the export per OBJ and writes the results as JSON next to the .blend file',
+        default = False)
     
     dev_fake_xplane2blender_version = bpy.props.StringProperty(
         name       = "Fake XPlane2Blender Version",
@@ -1353,6 +1358,20 @@ class XPlaneSceneSettings(bpy.types.PropertyGroup):
         default = False
     )
 
+    parallelExport = bpy.props.BoolProperty(
+        attr = "parallelExport",
+        name = "Parallel Export",
+        description = "If checked OBJs are formatted and written by other processes while the next ones are collected. Speeds up exporting many large OBJs on multi-core machines, not available on Windows",
+        default = False
+    )
+
+    skipUnchangedFiles = bpy.props.BoolProperty(
+        attr = "skipUnchangedFiles",
+        name = "Skip Unchanged Files",
+        description = "If checked OBJs that already exist with the exact same content are not rewritten, so their modification time stays the same",
+        default = False
+    )
+
     version = bpy.props.EnumProperty(
         attr = "version",
         name = "X-Plane Version",
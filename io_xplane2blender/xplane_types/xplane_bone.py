@@ -1,14 +1,78 @@
+import functools
+import heapq
 import math
-from typing import Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 import bpy
 import mathutils
 from io_xplane2blender.xplane_config import getDebug
 from io_xplane2blender.xplane_helpers import floatToStr, FLOAT_PRECISION, logger
-from io_xplane2blender.xplane_types.xplane_keyframe import XPlaneKeyframe
+from io_xplane2blender.xplane_types.xplane_keyframe import XPlaneKeyframe, XPlaneKeyframeSampler
 from io_xplane2blender.xplane_types.xplane_keyframe_collection import XPlaneKeyframeCollection
 #from xplane_object import XPlaneObject
 
+# Function: _memoize
+# Decorator for argument-less XPlaneBone methods whose result is stored in the
+# bone's cache until <XPlaneBone.invalidateCache> is called.
+#
+# Parameters:
+#   bool copyResult - (default False) Return copies of the cached result, for mutable results like matrices
+def _memoize(copyResult:bool = False):
+    def decorator(method):
+        name = method.__name__
+
+        @functools.wraps(method)
+        def wrapper(self):
+            if name not in self._cache:
+                self._cache[name] = method(self)
+
+            if copyResult:
+                return self._cache[name].copy()
+            else:
+                return self._cache[name]
+
+        return wrapper
+
+    return decorator
+
+# Function: indexDatarefFCurves
+# Parses the data paths of all fcurves of an action once and groups the
+# fcurves animating xplane.datarefs by the bone they belong to.
+#
+# Parameters:
+#   action - A Blender action
+#
+# Returns:
+#   dict - Bone names (None for fcurves not on a bone) as keys, lists of (order, fcurve, dataref index)
+#          as values. order is the position of the fcurve in the action. The dataref index is None
+#          for data paths <XPlaneBone.collectAnimations> can't parse.
+def indexDatarefFCurves(action)->Dict[Optional[str],List[Tuple[int,bpy.types.FCurve,Optional[int]]]]:
+    datarefFCurves = {}
+
+    for order, fcurve in enumerate(action.fcurves):
+        data_path = fcurve.data_path
+
+        #if (fcurve.group != None and fcurve.group.name == groupName): # since 2.61 group names are not set so we have to check the datapath
+        if 'xplane.datarefs' not in data_path:
+            continue
+
+        boneName = None
+        if data_path.startswith("bones[\""):
+            boneName = data_path[len("bones[\""):data_path.find("\"]", len("bones[\""))]
+
+        # get dataref index
+        index = None
+        pos = data_path.find('xplane.datarefs[')
+        if pos != -1:
+            try:
+                index = int(data_path[pos+len('xplane.datarefs[') : -len('].value')])
+            except:
+                pass
+
+        datarefFCurves.setdefault(boneName, []).append((order, fcurve, index))
+
+    return datarefFCurves
+
 # Class: XPlaneBone
 # Animation/Hierarchy primitive
 class XPlaneBone():
@@ -59,6 +123,24 @@ class XPlaneBone():
         # must be accessed via blenderObject.xplane.datarefs!
         self.datarefs = {} # type: Dict[bpy.types.StringProperty,XPlaneDataref]
 
+        # dict - Memoized animation predicates and matrices, see <invalidateCache>
+        self._cache = {} # type: Dict[str,Any]
+
+    # Method: invalidateCache
+    # Forgets the memoized animation predicates and matrices of this bone and, optionally, of all
+    # bones below it. Call it whenever <animations> change or the Blender pose (the current frame)
+    # changes after any of them was asked for. Children are invalidated too by default, since their
+    # results depend on their parents'.
+    #
+    # Parameters:
+    #   bool recursive - (default True) Invalidate the children as well
+    def invalidateCache(self, recursive:bool = True):
+        self._cache = {}
+
+        if recursive:
+            for child in self.children:
+                child.invalidateCache()
+
     def sortChildren(self):
         def getWeight(xplaneBone):
             if xplaneBone.xplaneObject:
@@ -70,6 +152,7 @@ class XPlaneBone():
 
     # Method: isAnimatedForTranslation
     # Checks if a dataref's keyframes actually contain meaningful translations, and we should therefore write keyframes out
+    @_memoize()
     def isDataRefAnimatedForTranslation(self):
         if hasattr(self, 'animations') and len(self.animations) > 0:
            #Check to see if there is at least some difference in the keyframe locations 
@@ -88,6 +171,7 @@ class XPlaneBone():
 
     # Method: isAnimatedForRotation
     # Checks if a dataref's keyframes actually contain meaningful rotation, and we should therefore write keyframes out
+    @_memoize()
     def isDataRefAnimatedForRotation(self):
         if hasattr(self, 'animations') and len(self.animations) > 0:
            #Check to see if there is at least some difference in the keyframe locations 
@@ -109,15 +193,42 @@ class XPlaneBone():
     #
     # Returns:
     #   bool - True if bone is animated, False if not.
+    @_memoize()
     def isAnimated(self):
         return self.isDataRefAnimatedForTranslation() or self.isDataRefAnimatedForRotation()
 
     # Method: collectAnimations
     # Stores all animations in <animations>.
-    def collectAnimations(self):
+    #
+    # Parameters:
+    #   XPlaneKeyframeSampler sampler - (optional) If given, the keyframes are only scheduled with it
+    #                                   and <animations> is filled once sampler.sample() was called.
+    #                                   Otherwise the keyframes of this bone are sampled right away.
+    def collectAnimations(self, sampler:Optional[XPlaneKeyframeSampler] = None):
         if not self.parent:
             return None
 
+        if sampler is None:
+            sampler = XPlaneKeyframeSampler()
+            self._collectAnimations(sampler)
+            sampler.sample()
+        else:
+            self._collectAnimations(sampler)
+
+    def _collectAnimations(self, sampler:XPlaneKeyframeSampler):
+        # (dataref, keyframes) to turn into <XPlaneKeyframeCollections> once they are sampled
+        unsampledAnimations = []
+
+        def storeAnimations():
+            for dataref, keyframes in unsampledAnimations:
+                # sort keyframes by frame number
+                keyframesSorted = sorted(keyframes, key = lambda keyframe: keyframe.index)
+                self.animations[dataref] = XPlaneKeyframeCollection(keyframesSorted)
+
+            self.invalidateCache(False)
+
+        sampler.addCallback(storeAnimations)
+
         debug = getDebug()
 
         bone = self.blenderBone
@@ -130,9 +241,9 @@ class XPlaneBone():
 
         #check for animation
         if bone:
-            logger.info("\t\t checking animations of %s:%s" % (blenderObject.name, bone.name))
+            logger.info("\t\t checking animations of %s:%s", blenderObject.name, bone.name)
         else:
-            logger.info("\t\t checking animations of %s" % blenderObject.name)
+            logger.info("\t\t checking animations of %s", blenderObject.name)
 
         animationData = blenderObject.animation_data
 
@@ -142,67 +253,62 @@ class XPlaneBone():
 
         if (animationData != None and animationData.action != None and len(animationData.action.fcurves) > 0):
             logger.info("\t\t animation found")
+
+            if self.xplaneFile:
+                datarefFCurves = self.xplaneFile.getDatarefFCurveIndex(animationData.action)
+            else:
+                datarefFCurves = indexDatarefFCurves(animationData.action)
+
+            # Ben says: I'm not sure if this is the right way to do this -- when we iterate the fcurve data for this
+            # armature, EVERY bone is included in a big pile.  So we parse the data_path and if it's clearly (1) for a bone and
+            # (2) NOT for us, we skip it.  Without this, the key frames from differing bones get cross-contaminated in a multi-
+            # bone case.
+            if bone:
+                fcurves = heapq.merge(datarefFCurves.get(None, []), datarefFCurves.get(bone.name, []))
+            else:
+                fcurves = heapq.merge(*datarefFCurves.values())
+
             #check for dataref animation by getting fcurves with the dataref group
-            for fcurve in animationData.action.fcurves:
-                logger.info("\t\t checking FCurve %s Group: %s" % (fcurve.data_path, fcurve.group))
-
-                # Ben says: I'm not sure if this is the right way to do this -- when we iterate the fcurve data for this
-                # armature, EVERY bone is included in a big pile.  So we parse the data_path and if it's clearly (1) for a bone and
-                # (2) NOT for us, we skip it.  Without this, the key frames from differing bones get cross-contaminated in a multi-
-                # bone case.
-                if fcurve.data_path.startswith("bones[\"") and bone != None:
-                    path_we_want = "bones[\"%s\"]" % bone.name
-                    if not fcurve.data_path.startswith(path_we_want):
-                        continue
-                
-                #if (fcurve.group != None and fcurve.group.name == groupName): # since 2.61 group names are not set so we have to check the datapath
-                if ('xplane.datarefs' in fcurve.data_path):
-                    # get dataref name
-                    pos = fcurve.data_path.find('xplane.datarefs[')
-                    if pos!=-1:
-                        index = fcurve.data_path[pos+len('xplane.datarefs[') : -len('].value')]
+            for order, fcurve, index in fcurves:
+                logger.info("\t\t checking FCurve %s Group: %s", fcurve.data_path, fcurve.group)
+
+                # old style datarefs with wrong datapaths can cause errors so we just skip them
+                if index is None:
+                    return
+
+                # FIXME: removed datarefs keep fcurves, so we have to check if dataref is still there.
+                # FCurves have to be deleted correctly.
+                if bone:
+                    if index < len(bone.xplane.datarefs):
+                        dataref = bone.xplane.datarefs[index].path
                     else:
                         return
-
-                    # old style datarefs with wrong datapaths can cause errors so we just skip them
-                    try:
-                        index = int(index)
-                    except:
-                        return
-
-                    # FIXME: removed datarefs keep fcurves, so we have to check if dataref is still there.
-                    # FCurves have to be deleted correctly.
-                    if bone:
-                        if index < len(bone.xplane.datarefs):
-                            dataref = bone.xplane.datarefs[index].path
-                        else:
-                            return
+                else:
+                    if index < len(blenderObject.xplane.datarefs):
+                        dataref = blenderObject.xplane.datarefs[index].path
                     else:
-                        if index < len(blenderObject.xplane.datarefs):
-                            dataref = blenderObject.xplane.datarefs[index].path
-                        else:
-                            return
+                        return
 
-                    logger.info("\t\t adding dataref animation: %s" % dataref)
+                logger.info("\t\t adding dataref animation: %s", dataref)
 
-                    if len(fcurve.keyframe_points) > 1:
-                        # time to add dataref to animations
+                if len(fcurve.keyframe_points) > 1:
+                    # time to add dataref to animations
 
-                        if bone:
-                            self.datarefs[dataref] = bone.xplane.datarefs[index]
-                        else:
-                            self.datarefs[dataref] = blenderObject.xplane.datarefs[index]
+                    if bone:
+                        self.datarefs[dataref] = bone.xplane.datarefs[index]
+                    else:
+                        self.datarefs[dataref] = blenderObject.xplane.datarefs[index]
 
-                        # store keyframes temporary, so we can resort them
-                        keyframes = []
+                    # store keyframes temporary, so we can resort them
+                    keyframes = []
 
-                        for i,keyframe in enumerate(fcurve.keyframe_points):
-                            logger.info("\t\t adding keyframe: %6.3f" % keyframe.co[0])
-                            keyframes.append(XPlaneKeyframe(keyframe,i,dataref,self))
+                    for i,keyframe in enumerate(fcurve.keyframe_points):
+                        logger.info("\t\t adding keyframe: %6.3f", keyframe.co[0])
+                        xplaneKeyframe = XPlaneKeyframe(keyframe,i,dataref,self,False)
+                        sampler.add(xplaneKeyframe, self)
+                        keyframes.append(xplaneKeyframe)
 
-                        # sort keyframes by frame number
-                        keyframesSorted = sorted(keyframes, key = lambda keyframe: keyframe.index)
-                        self.animations[dataref] = XPlaneKeyframeCollection(keyframesSorted)
+                    unsampledAnimations.append((dataref, keyframes))
 
     def getName(self,ignore_indent_level:bool=False)->str:
         '''
@@ -252,6 +358,7 @@ class XPlaneBone():
 
         return out
 
+    @_memoize()
     def getFirstAnimatedParent(self):
         if self.parent == None:
             return None
@@ -267,6 +374,7 @@ class XPlaneBone():
 	# If we want to emit a mesh, this is where the mesh lives.  The world matrix might be "more"
 	# transforms than post-animation if there is a static rotation after a dynamic translation.
 	#
+    @_memoize(copyResult = True)
     def getBlenderWorldMatrix(self):
         if self.blenderBone:
             # Blender bones in their current pose (which matches the shape of all data
@@ -299,6 +407,7 @@ class XPlaneBone():
 	#
 	# It is only legal to ask for this if (1) a bone is animated and (2) it is not the root
 	# bone.
+    @_memoize(copyResult = True)
     def getPreAnimationMatrix(self):
         if self.parent == None:
 			# No one should ever need the pre-animation matrix of the root bone -
@@ -375,6 +484,7 @@ class XPlaneBone():
 	# This matrix represents the world space pose of the bone just after all dynamic animation.  EVERY
 	# bone has this, because everything "on" the bone (sub-bones, meshes) is attached to this pose.
 	#
+    @_memoize(copyResult = True)
     def getPostAnimationMatrix(self):
         if self.parent == None:
             # WARNING: If the root bone has been scaled then the scale does NOT apply to the OBJ.
@@ -434,6 +544,7 @@ class XPlaneBone():
 	#
 	# The bake matrix for animations for bone X is the static transform _from X's parent bone to X before its animations.
 	# In other words, once we are in X's parent's coordinate system, we need to do this bake to then apply our animations.
+    @_memoize(copyResult = True)
     def getBakeMatrixForMyAnimations(self):
         parent_bone = self.getFirstAnimatedParent()
         if parent_bone == None:
@@ -456,6 +567,7 @@ class XPlaneBone():
     # This API gets the bake matrix to be applied to output-able primitives that are attached to -this- bone.
     # In other words, this is a helper for how to bake our lights, meshes, etc.
     #
+    @_memoize(copyResult = True)
     def getBakeMatrixForAttached(self):
 		# Our anchor bone is the thing we are attached to - it might be us, or it might be our parent.
         if self.isAnimated():
@@ -479,6 +591,7 @@ class XPlaneBone():
         return self.toString()
 
 
+    @_memoize()
     def writeAnimationPrefix(self):
         debug = getDebug()
         indent = self.getIndent()
@@ -799,6 +912,7 @@ class XPlaneBone():
 
         return o
 
+    @_memoize()
     def writeAnimationSuffix(self):
         o = ''
         indent = self.getIndent()
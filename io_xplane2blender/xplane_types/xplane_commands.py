@@ -1,4 +1,6 @@
+import io
 import re
+from typing import Dict, FrozenSet, List, Pattern, Tuple
 
 import bpy
 
@@ -89,6 +91,16 @@ class XPlaneCommands():
             'ATTR_solid_camera': 'ATTR_no_solid_camera'
         }
 
+        # The <reseters> table, compiled and sorted by setter pattern, see <_getSetterPatterns>.
+        # Rebuilt after <addReseter>, together with the per attribute name caches below.
+        self._setterPatterns = None # type: List[Tuple[Pattern,str]]
+
+        # attribute name -> indices of the setter patterns it matches
+        self._matchingSetterPatterns = {} # type: Dict[str,FrozenSet[int]]
+
+        # attribute name -> (resetters undoing it, indices of the setter patterns it shares state with)
+        self._counterpartGroups = {} # type: Dict[str,Tuple[List[str],FrozenSet[int]]]
+
         # these attributes/commands are not persistant and must always be rewritten
         self.inpersistant = {
             'ATTR_axis_detent_range',
@@ -116,20 +128,64 @@ class XPlaneCommands():
     # Returns:
     #   string - The OBJ commands table.
     def write(self, lod = -1):
-        o = ''
-        o += self.writeXPlaneBone(self.xplaneFile.rootBone, lod)
+        o = io.StringIO()
+        self.writeTo(o, lod)
 
-        return o
+        return o.getvalue()
+
+    # Method: writeTo
+    # Writes the OBJ commands table to out, one bone at a time.
+    #
+    # Params:
+    #   out - A file-like object with a write(str) method
+    #   int lod - (default -1) Level of detail randing from 0..2, if -1 no level of detail will be used
+    #
+    # Returns:
+    #   int - The number of characters written.
+    def writeTo(self, out, lod = -1):
+        return self.writeXPlaneBoneTo(out, self.xplaneFile.rootBone, lod)
 
     def writeXPlaneBone(self, xplaneBone, lod):
-        o = ''
-        o += xplaneBone.writeAnimationPrefix()
+        o = io.StringIO()
+        self.writeXPlaneBoneTo(o, xplaneBone, lod)
+
+        return o.getvalue()
+
+    def writeXPlaneBoneTo(self, out, xplaneBone, lod):
+        return self.writeLodBucketTo(out, self.collectLodBuckets([lod], xplaneBone)[lod])
+
+    # Method: collectLodBuckets
+    # Walks the bone tree once and sorts what has to be written for each LOD into a bucket.
+    #
+    # A bucket is a list of strings (animations, conditions) and <XPlaneObjects>.
+    # The objects are only written in <writeLodBucketTo>, since what an object writes
+    # depends on what the buckets written before it wrote (see <written>).
+    #
+    # Params:
+    #   list lods - The LODs to collect buckets for, -1 is the bucket of objects in no LOD
+    #   XPlaneBone xplaneBone - (default <XPlaneFile.rootBone>) The bone to start at
+    #
+    # Returns:
+    #   dict - The LODs as keys, their buckets as values
+    def collectLodBuckets(self, lods, xplaneBone = None):
+        if xplaneBone is None:
+            xplaneBone = self.xplaneFile.rootBone
+
+        buckets = {lod: [] for lod in lods}
+        self._collectLodBuckets(buckets, xplaneBone)
+
+        return buckets
+
+    def _collectLodBuckets(self, buckets, xplaneBone):
+        # animation prefixes and suffixes are memoized by the bone
+        animationPrefix = xplaneBone.writeAnimationPrefix()
+        animationSuffix = xplaneBone.writeAnimationSuffix()
         xplaneObject = xplaneBone.xplaneObject
-        xplaneObjectWritten = False
-        exportMode = self.xplaneFile.exportMode
-        numLods = int(self.xplaneFile.options.lods)
+        writtenInLods = []
 
         if xplaneObject:
+            exportMode = self.xplaneFile.exportMode
+            numLods = int(self.xplaneFile.options.lods)
             lods = []
 
             if exportMode == EXPORT_MODE_LAYERS:
@@ -144,29 +200,61 @@ class XPlaneCommands():
                     isInLod = True
                     break
 
-            if lod == -1:
-                # only write objects that are in no lod
-                if not isInLod or (exportMode == EXPORT_MODE_ROOT_OBJECTS and numLods <= 0):
-                    o += self._writeXPlaneObjectPrefix(xplaneObject)
-                    xplaneObjectWritten = True
+            for lod in buckets:
+                if lod == -1:
+                    # only write objects that are in no lod
+                    if not isInLod or (exportMode == EXPORT_MODE_ROOT_OBJECTS and numLods <= 0):
+                        writtenInLods.append(lod)
+
+                # write objects that are within that lod and in no lod, as those should appear everywhere
+                elif lods[lod] == True or not isInLod:
+                    writtenInLods.append(lod)
 
-            # write objects that are within that lod and in no lod, as those should appear everywhere
-            elif lods[lod] == True or not isInLod:
-                o += self._writeXPlaneObjectPrefix(xplaneObject)
-                xplaneObjectWritten = True
+        for bucket in buckets.values():
+            bucket.append(animationPrefix)
 
-        # write bone children
+        if writtenInLods:
+            objectPrefix = self._writeXPlaneObjectConditions(xplaneObject)
+
+            for lod in writtenInLods:
+                buckets[lod].append(objectPrefix)
+                buckets[lod].append(xplaneObject)
+
+        # collect bone children
         for childBone in xplaneBone.children:
-            o += self.writeXPlaneBone(childBone, lod)
+            self._collectLodBuckets(buckets, childBone)
 
-        if xplaneObject and xplaneObjectWritten:
-            o += self._writeXPlaneObjectSuffix(xplaneObject)
+        if writtenInLods:
+            objectSuffix = self._writeXPlaneObjectSuffix(xplaneObject)
 
-        o += xplaneBone.writeAnimationSuffix()
+            for lod in writtenInLods:
+                buckets[lod].append(objectSuffix)
 
-        return o
+        for bucket in buckets.values():
+            bucket.append(animationSuffix)
 
-    def _writeXPlaneObjectPrefix(self, xplaneObject):
+    # Method: writeLodBucketTo
+    # Writes a bucket from <collectLodBuckets> to out, writing its <XPlaneObjects> as it goes.
+    #
+    # Params:
+    #   out - A file-like object with a write(str) method
+    #   list bucket - A bucket from <collectLodBuckets>
+    #
+    # Returns:
+    #   int - The number of characters written.
+    def writeLodBucketTo(self, out, bucket):
+        written = 0
+
+        for item in bucket:
+            if not isinstance(item, str):
+                item = item.write()
+
+            out.write(item)
+            written += len(item)
+
+        return written
+
+    def _writeXPlaneObjectConditions(self, xplaneObject):
         o = ''
 
         # open material conditions
@@ -176,8 +264,6 @@ class XPlaneCommands():
         # open object conditions
         o += self._writeConditions(xplaneObject.conditions, xplaneObject)
 
-        o += xplaneObject.write()
-
         return o
 
     def _writeXPlaneObjectSuffix(self, xplaneObject):
@@ -279,6 +365,39 @@ class XPlaneCommands():
 
     def addReseter(self, attr:str, reseter:str):
         self.reseters[attr] = reseter
+        self._setterPatterns = None
+
+    # Method: _getSetterPatterns
+    # Returns the <reseters> table as a list of (compiled setter pattern, resetter), sorted by
+    # setter pattern. It is compiled once and again only after <addReseter> changed the table.
+    #
+    # Returns:
+    #   list - [(Pattern, str)]
+    def _getSetterPatterns(self):
+        if self._setterPatterns is None:
+            self._setterPatterns = [(re.compile(setterPattern), self.reseters[setterPattern])
+                                    for setterPattern in sorted(self.reseters.keys())]
+            self._matchingSetterPatterns = {}
+            self._counterpartGroups = {}
+
+        return self._setterPatterns
+
+    # Method: _getMatchingSetterPatterns
+    # Returns the indices into <_getSetterPatterns> of all setter patterns an attribute name matches.
+    #
+    # Parameters:
+    #   string attr - The attribute name
+    #
+    # Returns:
+    #   frozenset - Indices of the matching setter patterns
+    def _getMatchingSetterPatterns(self, attr):
+        setterPatterns = self._getSetterPatterns()
+
+        if attr not in self._matchingSetterPatterns:
+            self._matchingSetterPatterns[attr] = frozenset(
+                i for i, (pattern, resetter) in enumerate(setterPatterns) if pattern.fullmatch(attr))
+
+        return self._matchingSetterPatterns[attr]
 
     # Method: attributeIsReseter
     # Determines if a given attribute is a resetter.
@@ -300,29 +419,32 @@ class XPlaneCommands():
     # resetter that "undoes" it.  Given any resetter, this
     # returns all setters.
     def getAttributeCounterparts(self, attr):
+        setterPatterns = self._getSetterPatterns()
 
-        found=[]
-        setterPatterns = sorted(list(self.reseters.keys()))
-
-        for setterPattern in setterPatterns:
-            resetter = self.reseters[setterPattern]
-            compiledPattern = re.compile(setterPattern)
+        if attr not in self._counterpartGroups:
+            matching = self._getMatchingSetterPatterns(attr)
 
             # The attribute is a setter - the resetter is a counter part
-            if compiledPattern.fullmatch(attr):
-                found.append(resetter)
-    
+            resetters = [setterPatterns[i][1] for i in sorted(matching)]
+
             # The pattern is a resetter or ONE of the setters.
             # Every other setter but us is a counterpart.
-            if attr == resetter or compiledPattern.fullmatch(attr):
-                allWritten = sorted(list(self.written.keys()))
-                for oneWritten in allWritten:
-                    if compiledPattern.fullmatch(oneWritten):
-                        # We have to check for ourselves - we might be taking every written attribute
-                        # that is a SETTER that matches the reg-ex, e.g. we are ATTR_cockpit and we found
-                        # ATTR_cockpit|ATTR_cockpit_region.  So take ATTR_cockpit_region but NOT us.
-                        if oneWritten != attr:
-                            found.append(oneWritten)
+            groups = frozenset(i for i, (pattern, resetter) in enumerate(setterPatterns)
+                               if i in matching or attr == resetter)
+
+            self._counterpartGroups[attr] = (resetters, groups)
+
+        resetters, groups = self._counterpartGroups[attr]
+        found = list(resetters)
+
+        if groups:
+            for oneWritten in self.written:
+                # We have to check for ourselves - we might be taking every written attribute
+                # that is a SETTER that matches the reg-ex, e.g. we are ATTR_cockpit and we found
+                # ATTR_cockpit|ATTR_cockpit_region.  So take ATTR_cockpit_region but NOT us.
+                if oneWritten != attr and not groups.isdisjoint(self._getMatchingSetterPatterns(oneWritten)):
+                    found.append(oneWritten)
+
         return found
 
     # Method: writeReseters
@@ -400,16 +522,24 @@ class XPlaneCommands():
         # Comment about the comment about the comment:
         # The resetter system is so confusing its
         # good comments also need good comments. Ugh.
-        attributeNames = sorted(attributes.keys())
+        setterPatterns = self._getSetterPatterns()
+        matchingAttributes = [[] for setterPattern in setterPatterns]
+
+        for name in attributes.keys():
+            for i in self._getMatchingSetterPatterns(name):
+                matchingAttributes[i].append(name)
 
         # This is the attributes we have already stated that MIGHT need to be reset.
-        writtenNames = sorted(self.written.keys())
-        for setterPattern in sorted(self.reseters.keys()):
-            resetingAttr = self.reseters[setterPattern]
-            pattern = re.compile(setterPattern)
+        matchingWrittens = [[] for setterPattern in setterPatterns]
+
+        for name in self.written:
+            for i in self._getMatchingSetterPatterns(name):
+                matchingWrittens[i].append(name)
 
-            matchingWritten = [x for x in writtenNames if pattern.fullmatch(x)]
-            matchingAttribute = [x for x in attributeNames if pattern.fullmatch(x)]
+        for i, (pattern, resetingAttr) in enumerate(setterPatterns):
+            setterPattern = pattern.pattern
+            matchingWritten = matchingWrittens[i]
+            matchingAttribute = matchingAttributes[i]
 
             # Now that the added white list trick is in place,
             # we'll nearly always have 2 matching attributes
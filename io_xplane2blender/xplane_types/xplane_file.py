@@ -1,22 +1,30 @@
 # File: xplane_file.py
 # Defines X-Plane file data type.
 
+import array
 import collections
+import io
+import itertools
+import os
+import time
 
 import bpy
 import mathutils
 
-from typing import Union
+from typing import Dict, List, Optional, Tuple, Union
 from io_xplane2blender import xplane_helpers
 from io_xplane2blender.xplane_types import xplane_empty
 
-from ..xplane_helpers import floatToStr, logger
-from .xplane_bone import XPlaneBone
+from ..xplane_config import getDebug
+from ..xplane_helpers import floatToStr, logger, profiler
+from .xplane_bone import XPlaneBone, indexDatarefFCurves
 from .xplane_commands import XPlaneCommands
+from .xplane_keyframe import XPlaneKeyframeSampler
 from .xplane_header import XPlaneHeader
 from .xplane_light import XPlaneLight
 from .xplane_lights import XPlaneLights
 from io_xplane2blender.xplane_types import xplane_material_utils
+from io_xplane2blender.xplane_types import xplane_mesh
 from .xplane_mesh import XPlaneMesh
 from io_xplane2blender import xplane_props
 from .xplane_object import XPlaneObject
@@ -58,18 +66,58 @@ def getFileNameFromBlenderObject(blenderObject, xplaneLayer):
 
     return filename
 
-def createFilesFromBlenderLayers():
+# Function: getBlenderObjectsByLayerIndex
+# Sorts the visible scene objects into the given Blender layers in a single pass,
+# leaving out objects whose "export_mesh" flag is off for a layer.
+#
+# Parameters:
+#   layerIndexes - Indices of the Blender layers to collect objects for.
+#
+# Returns:
+#   dict - Blender layer index -> list of Blender objects in scene order.
+def getBlenderObjectsByLayerIndex(layerIndexes:List[int])->Dict[int,List[bpy.types.Object]]:
+    buckets = {layerIndex: [] for layerIndex in layerIndexes}
+
+    for blenderObject in bpy.context.scene.objects:
+        logger.info("scanning %s", blenderObject.name)
+
+        if blenderObject.hide:
+            continue
+
+        layers = blenderObject.layers
+        exportMesh = getattr(blenderObject.xplane, 'export_mesh', None)
+
+        for layerIndex, bucket in buckets.items():
+            if layers[layerIndex] and (exportMesh is None or exportMesh[layerIndex]):
+                bucket.append(blenderObject)
+
+    return buckets
+
+# Function: createFilesFromBlenderLayers
+#
+# Parameters:
+#   layerFilter - Optional, callable taking a layer index and the layer's Blender objects.
+#   Layers it returns False for are skipped.
+#
+# Returns:
+#   list - <XPlaneFiles> of all active layers
+def createFilesFromBlenderLayers(layerFilter = None):
     xplaneFiles = []
+    layerIndexes = getActiveBlenderLayerIndexes()
+    blenderObjectsByLayerIndex = getBlenderObjectsByLayerIndex(layerIndexes)
+
+    for layerIndex in layerIndexes:
+        if layerFilter and not layerFilter(layerIndex, blenderObjectsByLayerIndex[layerIndex]):
+            continue
 
-    for layerIndex in getActiveBlenderLayerIndexes():
-        xplaneFile = createFileFromBlenderLayerIndex(layerIndex)
+        xplaneFile = createFileFromBlenderLayerIndex(layerIndex, blenderObjectsByLayerIndex[layerIndex])
 
         if xplaneFile:
             xplaneFiles.append(xplaneFile)
 
     return xplaneFiles
 
-def createFileFromBlenderLayerIndex(layerIndex):
+def createFileFromBlenderLayerIndex(layerIndex, blenderObjects = None):
     xplaneFile = None
     xplaneLayer = getXPlaneLayerForBlenderLayerIndex(layerIndex)
 
@@ -78,7 +126,7 @@ def createFileFromBlenderLayerIndex(layerIndex):
 
         if xplaneFile:
             xplaneFile.exportMode = bpy.context.scene.xplane.exportMode
-            xplaneFile.collectFromBlenderLayerIndex(layerIndex)
+            xplaneFile.collectFromBlenderLayerIndex(layerIndex, blenderObjects)
 
     return xplaneFile
 
@@ -96,11 +144,22 @@ def createFileFromBlenderRootObject(blenderObject):
 
     return xplaneFile
 
-def createFilesFromBlenderRootObjects(scene):
+# Function: createFilesFromBlenderRootObjects
+#
+# Parameters:
+#   scene - Blender scene
+#   rootObjectFilter - Optional, callable taking a root object. Root objects it returns False for are skipped.
+#
+# Returns:
+#   list - <XPlaneFiles> of all exportable root objects
+def createFilesFromBlenderRootObjects(scene, rootObjectFilter = None):
     xplaneFiles = []
 
     for blenderObject in scene.objects:
         if blenderObject.xplane.isExportableRoot and blenderObject.xplane.layer.export:
+            if rootObjectFilter and not rootObjectFilter(blenderObject):
+                continue
+
             xplaneFile = createFileFromBlenderRootObject(blenderObject)
 
             if xplaneFile:
@@ -141,30 +200,48 @@ class XPlaneFile():
         # materials representing the reference for export
         self.referenceMaterials = None
 
+        # samples the keyframes of all bones frame by frame once the bone tree is collected
+        self._keyframeSampler = XPlaneKeyframeSampler()
+
+        # dict of Blender object pointers (as_pointer()) and their child Blender objects, see <indexChildBlenderObjects>.
+        # Names are not unique, a linked object can have the same name as a local one
+        self._childBlenderObjects = None # type: Optional[Dict[int,List[bpy.types.Object]]]
+
+        # dict of (armature pointer, bone name) and the Blender objects of <objects> parented to that bone,
+        # see <getChildBlenderObjectsForBlenderBone>. Only the first _boneChildBlenderObjectsCount
+        # entries of <objects> are indexed
+        self._boneChildBlenderObjects = {} # type: Dict[Tuple[int,str],List[bpy.types.Object]]
+        self._boneChildBlenderObjectsCount = 0
+
+        # dict of action names and their <indexDatarefFCurves>, see <getDatarefFCurveIndex>
+        self._datarefFCurveIndices = {} # type: Dict[str,Dict[Optional[str],List[Tuple[int,bpy.types.FCurve,Optional[int]]]]]
+
     # Method: collectFromBlenderLayerIndex
     # collects all objects in a given blender layer
     #
     # Parameters:
     #   layerIndex - int
-    def collectFromBlenderLayerIndex(self, layerIndex):
+    #   blenderObjects - Optional, the objects of the layer as found by <getBlenderObjectsByLayerIndex>.
+    def collectFromBlenderLayerIndex(self, layerIndex, blenderObjects = None):
         currentFrame = bpy.context.scene.frame_current
+        self.indexChildBlenderObjects()
 
-        blenderObjects = []
+        with profiler.phase(self, 'collection'):
+            if blenderObjects is None:
+                blenderObjects = getBlenderObjectsByLayerIndex([layerIndex])[layerIndex]
 
-        for blenderObject in bpy.context.scene.objects:
-            logger.info("scanning %s" % blenderObject.name)
+            self.collectBlenderObjects(blenderObjects)
+            self.rootBone = XPlaneBone(None,None,None,self)
+            self.collectBonesFromBlenderObjects(self.rootBone, blenderObjects)
 
-            for i in range(len(blenderObject.layers)):
-                if blenderObject.layers[i] == True and i == layerIndex and blenderObject.hide == False:
-                    if not hasattr(blenderObject.xplane, 'export_mesh') or blenderObject.xplane.export_mesh[layerIndex] == True:
-                        blenderObjects.append(blenderObject)
+        with profiler.phase(self, 'keyframe sampling'):
+            self._keyframeSampler.sample()
 
-        self.collectBlenderObjects(blenderObjects)
-        self.rootBone = XPlaneBone(None,None,None,self)
-        self.collectBonesFromBlenderObjects(self.rootBone, blenderObjects)
+            # restore frame before export
+            bpy.context.scene.frame_set(frame = currentFrame)
 
-        # restore frame before export
-        bpy.context.scene.frame_set(frame = currentFrame)
+        # anything memoized while collecting might have been computed on another frame
+        self.rootBone.invalidateCache()
 
         # go through blender objects and warn user if there is no xplaneBone for it
         for name in self.objects:
@@ -248,16 +325,18 @@ class XPlaneFile():
 
             bone = XPlaneBone(blenderObject, xplaneObject, parentBone, self)
             parentBone.children.append(bone)
-            bone.collectAnimations()
+            bone.collectAnimations(self._keyframeSampler)
 
-            # xplaneObject is now complete and can collect all data
+            # xplaneObject is now complete and can collect all data,
+            # as soon as the animations of its bone are sampled
             if xplaneObject:
-                xplaneObject.collect()
+                self._keyframeSampler.addCallback(xplaneObject.collect)
 
             # expand group objects to temporary objects
             if blenderObject.dupli_type == 'GROUP' and blenderObject.name not in self._resolvedBlenderGroupInstances:
                 tempBlenderObjects = self._resolveBlenderGroupInstance(blenderObject)
                 self.collectBlenderObjects(tempBlenderObjects)
+                # the temporary objects are new children, so we can't use the index here
                 self.collectBonesFromBlenderObjects(bone, blenderObject.children, False)
 
             # collect armature bones
@@ -268,11 +347,11 @@ class XPlaneFile():
                 # tells us to SKIP any direct child with a bone parent.  In Blender, a data block that
                 # is parented to a bone shows up as a datablock child of the armature, so without this
                 # we'd export each data block twice, which is bad.
-                self.collectBonesFromBlenderObjects(bone, blenderObject.children, True, True)
+                self.collectBonesFromBlenderObjects(bone, self.getChildBlenderObjects(blenderObject), True, True)
 
             # collect regular children
             else:
-                self.collectBonesFromBlenderObjects(bone, blenderObject.children, False)
+                self.collectBonesFromBlenderObjects(bone, self.getChildBlenderObjects(blenderObject), False)
 
         parentBone.sortChildren()
 
@@ -294,7 +373,7 @@ class XPlaneFile():
             bone.blenderBone = blenderBone
             parentBone.children.append(bone)
 
-            bone.collectAnimations()
+            bone.collectAnimations(self._keyframeSampler)
 
             # collect child blender objects of this bone
             childBlenderObjects = self.getChildBlenderObjectsForBlenderBone(blenderBone, blenderArmature)
@@ -304,18 +383,75 @@ class XPlaneFile():
 
         parentBone.sortChildren()
 
+    # Method: getChildBlenderObjectsForBlenderBone
+    # Returns the Blender objects of <objects> that are parented to a bone of an armature.
+    #
+    # The objects are indexed by (armature pointer, bone name) as they are added to <objects>,
+    # instead of scanning all <objects> for every bone.
+    #
+    # Parameters:
+    #   blenderBone - The Blender bone
+    #   blenderArmature - The Blender armature object of blenderBone
+    #
+    # Returns:
+    #   list - The Blender objects, in the order of <objects>
     def getChildBlenderObjectsForBlenderBone(self, blenderBone, blenderArmature):
-        blenderObjects = []
+        if self._boneChildBlenderObjectsCount > len(self.objects):
+            self._boneChildBlenderObjects = {}
+            self._boneChildBlenderObjectsCount = 0
 
-        for name in self.objects:
-            xplaneObject = self.objects[name]
+        if self._boneChildBlenderObjectsCount < len(self.objects):
+            for xplaneObject in itertools.islice(self.objects.values(), self._boneChildBlenderObjectsCount, None):
+                blenderObject = xplaneObject.blenderObject
 
-            if xplaneObject.blenderObject.parent_type == 'BONE' and \
-               xplaneObject.blenderObject.parent == blenderArmature and \
-               xplaneObject.blenderObject.parent_bone == blenderBone.name:
-                blenderObjects.append(xplaneObject.blenderObject)
+                if blenderObject.parent_type == 'BONE' and blenderObject.parent:
+                    self._boneChildBlenderObjects.setdefault(
+                        (blenderObject.parent.as_pointer(), blenderObject.parent_bone), []).append(blenderObject)
 
-        return blenderObjects
+            self._boneChildBlenderObjectsCount = len(self.objects)
+
+        return list(self._boneChildBlenderObjects.get((blenderArmature.as_pointer(), blenderBone.name), []))
+
+    # Method: getDatarefFCurveIndex
+    # Returns the <indexDatarefFCurves> of an action, indexing each action only once per file
+    # instead of once for every bone animated by it.
+    #
+    # Parameters:
+    #   action - A Blender action
+    #
+    # Returns:
+    #   dict - See <indexDatarefFCurves>
+    def getDatarefFCurveIndex(self, action):
+        if action.name not in self._datarefFCurveIndices:
+            self._datarefFCurveIndices[action.name] = indexDatarefFCurves(action)
+
+        return self._datarefFCurveIndices[action.name]
+
+    # Method: indexChildBlenderObjects
+    # Indexes the children of all Blender objects, for <getChildBlenderObjects>.
+    #
+    # Blender's Object.children scans all objects of the .blend on every access,
+    # which makes walking big hierarchies quadratic.
+    def indexChildBlenderObjects(self):
+        self._childBlenderObjects = {}
+
+        for blenderObject in bpy.data.objects:
+            if blenderObject.parent:
+                self._childBlenderObjects.setdefault(blenderObject.parent.as_pointer(), []).append(blenderObject)
+
+    # Method: getChildBlenderObjects
+    # Returns the same as blenderObject.children, using the index from <indexChildBlenderObjects>.
+    #
+    # Parameters:
+    #   blenderObject - A Blender object
+    #
+    # Returns:
+    #   list - The child Blender objects
+    def getChildBlenderObjects(self, blenderObject):
+        if self._childBlenderObjects is None:
+            return list(blenderObject.children)
+
+        return list(self._childBlenderObjects.get(blenderObject.as_pointer(), []))
 
     # Method: collectFromBlenderRootObject
     # collects all objects in a given blender root object
@@ -324,30 +460,38 @@ class XPlaneFile():
     #   rootObject - blender object
     def collectFromBlenderRootObject(self, blenderRootObject):
         currentFrame = bpy.context.scene.frame_current
+        self.indexChildBlenderObjects()
 
         blenderObjects = [blenderRootObject]
 
         def collectChildren(parentObject):
-            for blenderObject in parentObject.children:
-                logger.info("scanning %s" % blenderObject.name)
+            for blenderObject in self.getChildBlenderObjects(parentObject):
+                logger.info("scanning %s", blenderObject.name)
 
                 blenderObjects.append(blenderObject)
                 collectChildren(blenderObject)
 
-        collectChildren(blenderRootObject)
-        self.collectBlenderObjects(blenderObjects)
+        with profiler.phase(self, 'collection'):
+            collectChildren(blenderRootObject)
+            self.collectBlenderObjects(blenderObjects)
 
-        # setup root bone and root xplane object
-        rootXPlaneObject = self.objects[blenderRootObject.name]
-        self.rootBone = XPlaneBone(blenderRootObject, rootXPlaneObject,None,self)
+            # setup root bone and root xplane object
+            rootXPlaneObject = self.objects[blenderRootObject.name]
+            self.rootBone = XPlaneBone(blenderRootObject, rootXPlaneObject,None,self)
 
-        # need to collect data
-        rootXPlaneObject.collect()
+            # need to collect data
+            rootXPlaneObject.collect()
 
-        self.collectBonesFromBlenderObjects(self.rootBone, blenderObjects)
+            self.collectBonesFromBlenderObjects(self.rootBone, blenderObjects)
 
-        # restore frame before export
-        bpy.context.scene.frame_set(frame = currentFrame)
+        with profiler.phase(self, 'keyframe sampling'):
+            self._keyframeSampler.sample()
+
+            # restore frame before export
+            bpy.context.scene.frame_set(frame = currentFrame)
+
+        # anything memoized while collecting might have been computed on another frame
+        self.rootBone.invalidateCache()
 
     # Method: convertBlenderObject
     # Converts/wraps blender object into an <XPlaneObject> or subtype
@@ -359,18 +503,18 @@ class XPlaneFile():
 
         # mesh: let's create a prim out of it
         if blenderObject.type == "MESH":
-            logger.info("\t %s: adding to list" % blenderObject.name)
+            logger.info("\t %s: adding to list", blenderObject.name)
             xplaneObject = XPlanePrimitive(blenderObject)
 
         # lamp: let's create a XPlaneLight. Those cannot have children (yet).
         elif blenderObject.type == "LAMP":
-            logger.info("\t %s: adding to list" % blenderObject.name)
+            logger.info("\t %s: adding to list", blenderObject.name)
             xplaneObject  = XPlaneLight(blenderObject)
         elif blenderObject.type == "ARMATURE":
-            logger.info("\t %s: adding to list" % blenderObject.name)
+            logger.info("\t %s: adding to list", blenderObject.name)
             xplaneObject = XPlaneObject(blenderObject)
         elif blenderObject.type == "EMPTY":
-            logger.info("\t %s: adding to list" % blenderObject.name)
+            logger.info("\t %s: adding to list", blenderObject.name)
             xplaneObject = xplane_empty.XPlaneEmpty(blenderObject)
             
         return xplaneObject
@@ -398,18 +542,22 @@ class XPlaneFile():
 
         return objects
 
+    # Method: validateMaterials
+    # Validates the materials of all mesh objects. Materials are validated once per Blender material
+    # (and manipulator setting of the objects, which validation also depends on), and errors and warnings
+    # are reported once with all objects using it.
+    #
+    # Returns:
+    #   bool - True if there were no errors
     def validateMaterials(self):
-        objects = self.getObjectsList()
-
-        for xplaneObject in objects:
-            if xplaneObject.type == 'MESH' and xplaneObject.material.options:
-                errors,warnings = xplaneObject.material.isValid(self.options.export_type)
-
-                for error in errors:
-                    logger.error('Material "%s" in object "%s" %s' % (xplaneObject.material.name, xplaneObject.blenderObject.name, error))
+        groups = self._groupMaterials(
+            self.getMaterials(),
+            lambda material: (material.blenderMaterial.as_pointer(), material.blenderObject.xplane.manip.enabled)
+        )
 
-                for warning in warnings:
-                    logger.warn('Material "%s" in object "%s" %s' % (xplaneObject.material.name, xplaneObject.blenderObject.name, warning))
+        for materials in groups:
+            errors,warnings = materials[0].isValid(self.options.export_type)
+            self._logMaterialMessages(materials, errors, warnings)
 
         if logger.hasErrors():
             return False
@@ -426,28 +574,72 @@ class XPlaneFile():
 
         return materials
 
+    # Method: compareMaterials
+    # Compares the materials of all mesh objects against the reference materials, once per Blender material,
+    # as the comparison only depends on it. See <validateMaterials>.
+    #
+    # Parameters:
+    #   list refMaterials - The reference <XPlaneMaterials>, see <xplane_material_utils.getReferenceMaterials>
+    #
+    # Returns:
+    #   bool - True if there were no errors
     def compareMaterials(self, refMaterials):
-        materials = self.getMaterials()
+        groups = self._groupMaterials(
+            self.getMaterials(),
+            lambda material: material.blenderMaterial.as_pointer()
+        )
 
         for refMaterial in refMaterials:
             if refMaterial is not None:
-                for material in materials:
+                for materials in groups:
+                    material = materials[0]
                     # only compare draped materials agains draped
                     # and non-draped agains non-draped
                     if refMaterial.options.draped == material.options.draped:
                         errors,warnings = material.isCompatibleTo(refMaterial, self.options.export_type,self.options.autodetectTextures)
-                        xplaneObject = material.xplaneObject
-                        for error in errors:
-                            logger.error('Material "%s" in object "%s" %s' % (material.name, xplaneObject.blenderObject.name, error))
-
-                        for warning in warnings:
-                            logger.warn('Material "%s" in object "%s" %s' % (material.name, xplaneObject.blenderObject.name, warning))
+                        self._logMaterialMessages(materials, errors, warnings)
 
         if logger.hasErrors():
             return False
 
         return True
 
+    # Method: _groupMaterials
+    #
+    # Parameters:
+    #   list materials - <XPlaneMaterials>
+    #   function getKey - Returns the key of a <XPlaneMaterial>, materials with equal keys get the same results
+    #
+    # Returns:
+    #   list - Lists of <XPlaneMaterials> with equal keys, in order of first appearance
+    def _groupMaterials(self, materials, getKey):
+        groups = collections.OrderedDict()
+
+        for material in materials:
+            groups.setdefault(getKey(material), []).append(material)
+
+        return list(groups.values())
+
+    # Method: _logMaterialMessages
+    # Logs the errors and warnings of a group of materials, see <_groupMaterials>.
+    #
+    # Parameters:
+    #   list materials - <XPlaneMaterials> sharing one Blender material
+    #   list errors - Error messages
+    #   list warnings - Warning messages
+    def _logMaterialMessages(self, materials, errors, warnings):
+        if not errors and not warnings:
+            return
+
+        objectNames = '", "'.join(material.blenderObject.name for material in materials)
+        objects = 'objects' if len(materials) > 1 else 'object'
+
+        for error in errors:
+            logger.error('Material "%s" in %s "%s" %s', materials[0].name, objects, objectNames, error)
+
+        for warning in warnings:
+            logger.warn('Material "%s" in %s "%s" %s', materials[0].name, objects, objectNames, warning)
+
     def writeFooter(self):
         build = 'unknown'
 
@@ -458,14 +650,24 @@ class XPlaneFile():
         
         return "# Build with Blender %s (build %s). Exported with XPlane2Blender %s" % (bpy.app.version_string, build, xplane_helpers.VerStruct.current())
 
-    # Method: write
-    # Returns OBJ file code
-    def write(self):
-        self.mesh.collectXPlaneObjects(self.getObjectsList())
+    # Method: prepareWrite
+    # Collects the mesh and validates and compares the materials, everything
+    # that has to happen before the first line of the OBJ can be written.
+    # After this POINT_COUNTS is known.
+    #
+    # Returns:
+    #   bool - True if the file can be written, False if there were errors
+    def prepareWrite(self):
+        with profiler.phase(self, 'mesh'):
+            self.mesh.collectXPlaneObjects(self.getObjectsList())
+
+        with profiler.phase(self, 'material validation'):
+            return self._validateAndCompareMaterials()
 
+    def _validateAndCompareMaterials(self):
         # validate materials
         if not self.validateMaterials():
-            return ''
+            return False
 
         # detect reference materials
         self.referenceMaterials = xplane_material_utils.getReferenceMaterials(
@@ -478,7 +680,7 @@ class XPlaneFile():
             if refMat:
                 refMatNames.append(refMat.name)
 
-        logger.info('Using the following reference materials: %s' % ', '.join(refMatNames))
+        logger.info('Using the following reference materials: %s', ', '.join(refMatNames))
 
         # validation was successful
         # retrieve reference materials
@@ -487,42 +689,99 @@ class XPlaneFile():
             logger.info('Autodetect textures overridden for file %s: not fully checking manually entered textures against Blender-based reference materials\' textures' % (self.filename))
         
         if not self.compareMaterials(self.referenceMaterials):
+            return False
+
+        return True
+
+    # Method: write
+    # Returns OBJ file code
+    def write(self):
+        if not self.prepareWrite():
             return ''
-        
-        o = ''
-        o += self.header.write()
-        o += '\n'
 
-        meshOut = self.mesh.write()
-        o += meshOut
+        o = io.StringIO()
+        self.writeTo(o)
 
+        return o.getvalue()
+
+    # Method: writeTo
+    # Writes the OBJ file code to out, a section at a time, so the whole
+    # OBJ never has to be held in memory. <prepareWrite> must have been called before.
+    #
+    # Parameters:
+    #   out - A file-like object with a write(str) method
+    def writeTo(self, out):
+        with profiler.phase(self, 'header'):
+            self.header.writeTo(out)
+            out.write('\n')
 
-        if len(meshOut):
-            o += '\n'
+        with profiler.phase(self, 'serialization'):
+            if self.mesh.writeTo(out):
+                out.write('\n')
 
-        # TODO: deprecate in v3.4
-        lightsOut = self.lights.write()
-        o += lightsOut
+            # TODO: deprecate in v3.4
+            if self.lights.writeTo(out):
+                out.write('\n')
 
-        if len(lightsOut):
-            o += '\n'
+        with profiler.phase(self, 'commands'):
+            if self._writeLodsTo(out):
+                out.write('\n')
 
-        lodsOut = self._writeLods()
-        o += lodsOut
+        with profiler.phase(self, 'serialization'):
+            out.write(self.writeFooter())
 
-        if len(lodsOut):
-            o += '\n'
+        self.cleanup()
 
-        o += self.writeFooter()
+    # Method: snapshot
+    # Renders everything that needs bpy (header, lights, commands, footer) to strings
+    # and pairs it with copies of the collected vertices and indices. The snapshot can then be
+    # written from another process, see <writeSnapshot>. <prepareWrite> must have been called before.
+    #
+    # Returns:
+    #   XPlaneFileSnapshot - The bpy free contents of this file
+    def snapshot(self):
+        with profiler.phase(self, 'header'):
+            header = self.header.write()
+
+        with profiler.phase(self, 'serialization'):
+            lights = self.lights.write()
+            footer = self.writeFooter()
+
+        with profiler.phase(self, 'commands'):
+            lods = self._writeLods()
+
+        snapshot = XPlaneFileSnapshot(
+            self.filename,
+            header,
+            self.mesh.getVerticesArray(),
+            list(self.mesh.indices),
+            getDebug(),
+            lights,
+            lods,
+            footer
+        )
 
         self.cleanup()
 
-        return o
+        return snapshot
 
     def _writeLods(self):
-        o = ''
+        o = io.StringIO()
+        self._writeLodsTo(o)
+
+        return o.getvalue()
+
+    def _writeLodsTo(self, out):
+        written = 0
         numLods = int(self.options.lods)
 
+        def write(o):
+            out.write(o)
+            return len(o)
+
+        # (ATTR_LOD line or None, LOD bucket) in the order they are written
+        sections = []
+
         # if lods are present we need one base lod containing all objects
         # not in a lod that should always be visible
         if numLods > 0:
@@ -540,28 +799,33 @@ class XPlaneFile():
                     tallestFar = far
 
             if smallestNear > 0:
-                o += "ATTR_LOD 0.0 %s\n" % floatToStr(smallestNear)
-                o += self.commands.write()
+                sections.append(("ATTR_LOD 0.0 %s\n" % floatToStr(smallestNear), -1))
         else:
-            o += self.commands.write()
+            sections.append((None, -1))
 
         # write commands for each additional LOD
         for lodIndex in range(0, numLods):
             if lodIndex < len(self.options.lod):
-                o += "ATTR_LOD %s %s\n" % (
+                sections.append(("ATTR_LOD %s %s\n" % (
                     floatToStr(self.options.lod[lodIndex].near),
                     floatToStr(self.options.lod[lodIndex].far)
-                )
-                o += self.commands.write(lodIndex)
+                ), lodIndex))
 
         #TODO: Who's idea was this? Is this in the OBJ Spec?
         # if lods are present we need to attach a closing lod
         # containing all objects not in a lod that should always be visible
         if numLods > 0 and tallestFar < 100000:
-            o += "ATTR_LOD %s 100000\n" % floatToStr(tallestFar)
-            o += self.commands.write()
+            sections.append(("ATTR_LOD %s 100000\n" % floatToStr(tallestFar), -1))
+
+        # One walk over the bone tree for all LODs
+        buckets = self.commands.collectLodBuckets({lod for attrLod, lod in sections})
 
-        return o
+        for attrLod, lod in sections:
+            if attrLod is not None:
+                written += write(attrLod)
+            written += self.commands.writeLodBucketTo(out, buckets[lod])
+
+        return written
 
     # Method: cleanup
     # Removes temporary blender data
@@ -569,3 +833,97 @@ class XPlaneFile():
         while(len(self._tempBlenderObjects) > 0):
             tempBlenderObject = self._tempBlenderObjects.pop()
             bpy.data.objects.remove(tempBlenderObject)
+
+# Class: XPlaneFileSnapshot
+# The contents of a prepared <XPlaneFile> as plain Python data. It does not touch bpy and
+# can be pickled, so it can be serialized in another process. See <XPlaneFile.snapshot>.
+class XPlaneFileSnapshot():
+    # Constructor: __init__
+    #
+    # Parameters:
+    #   string filename - The filename of the <XPlaneFile>
+    #   string header - The OBJ header
+    #   array vertices - The collected vertices as array('f'), see <XPlaneMesh.getVerticesArray>
+    #   list indices - The collected indices
+    #   bool debug - If True every VT row gets its index as comment
+    #   string lights - The OBJ lights table
+    #   string lods - The OBJ commands of all LODs
+    #   string footer - The OBJ footer
+    def __init__(self, filename:str, header:str, vertices:array.array, indices:List[int], debug:bool, lights:str, lods:str, footer:str):
+        self.filename = filename
+        self.header = header
+        self.vertices = vertices
+        self.indices = indices
+        self.debug = debug
+        self.lights = lights
+        self.lods = lods
+        self.footer = footer
+
+    # Method: write
+    # Returns OBJ file code
+    def write(self):
+        o = io.StringIO()
+        self.writeTo(o)
+
+        return o.getvalue()
+
+    # Method: writeTo
+    # Writes the OBJ file code to out, the same way <XPlaneFile.writeTo> does.
+    #
+    # Parameters:
+    #   out - A file-like object with a write(str) method
+    def writeTo(self, out):
+        out.write(self.header)
+        out.write('\n')
+
+        if xplane_mesh.writeTablesTo(out, self.vertices, self.indices, self.debug):
+            out.write('\n')
+
+        out.write(self.lights)
+        if len(self.lights):
+            out.write('\n')
+
+        out.write(self.lods)
+        if len(self.lods):
+            out.write('\n')
+
+        out.write(self.footer)
+
+    # Method: writeToFile
+    # Writes the OBJ file code to a temporary file next to filepath first and
+    # replaces filepath with it once everything was written.
+    #
+    # Parameters:
+    #   string filepath - The absolute path of the OBJ file
+    #   bool onlyIfChanged - If True an existing file with the same content is not replaced
+    #
+    # Returns:
+    #   bool - True if the file was written, False if it was unchanged
+    def writeToFile(self, filepath:str, onlyIfChanged:bool = False)->bool:
+        tmppath = filepath + '.tmp'
+        try:
+            os.makedirs(os.path.dirname(filepath), exist_ok=True)
+            with open(tmppath, 'w') as objFile:
+                self.writeTo(objFile)
+
+            return xplane_helpers.replaceFile(tmppath, filepath, onlyIfChanged)
+        finally:
+            if os.path.exists(tmppath):
+                os.remove(tmppath)
+
+# Function: writeSnapshot
+# Writes an <XPlaneFileSnapshot> to a file, meant to be run by a process pool.
+# Like the snapshot it does not touch bpy, logger or profiler, the caller logs and profiles the result.
+#
+# Parameters:
+#   XPlaneFileSnapshot snapshot - The snapshot to write
+#   string filepath - The absolute path of the OBJ file
+#   bool onlyIfChanged - See <XPlaneFileSnapshot.writeToFile>
+#
+# Returns:
+#   tuple - (bool written, float seconds), written is False if the file was unchanged
+def writeSnapshot(snapshot:XPlaneFileSnapshot, filepath:str, onlyIfChanged:bool)->Tuple[bool, float]:
+    start = time.perf_counter()
+    written = snapshot.writeToFile(filepath, onlyIfChanged)
+
+    return written, time.perf_counter() - start
@@ -1,3 +1,4 @@
+import json
 import os
 import platform
 import re
@@ -8,14 +9,24 @@ from io_xplane2blender.xplane_constants import (EXPORT_TYPE_AIRCRAFT,
                                                 EXPORT_TYPE_SCENERY)
 
 from ..xplane_constants import *
-from ..xplane_helpers import floatToStr, logger, resolveBlenderPath
+from ..xplane_helpers import (floatToStr, getCanonicalPath, getFileHash,
+                              getRelativePath, logger, resolveBlenderPath)
 from ..xplane_image_composer import (combineSpecularAndNormal,
-                                     getImageByFilepath, normalWithoutAlpha,
-                                     specularToGrayscale)
+                                     getImageByFilepath, indexImage,
+                                     normalWithoutAlpha, specularToGrayscale)
 from .xplane_attribute import XPlaneAttribute
 from .xplane_attributes import XPlaneAttributes
 
-from typing import List
+from typing import List, Optional
+
+# Constant: COMPOSITE_MANIFEST_EXTENSION
+# Appended to the path of a composite texture to get the path of its manifest,
+# see <XPlaneHeader._getCompositeManifest>
+COMPOSITE_MANIFEST_EXTENSION = '.xplane2blender.json'
+
+# Constant: COMPOSITE_MANIFEST_VERSION
+# Must be increased whenever compositing changes, so older composites are rebuilt
+COMPOSITE_MANIFEST_VERSION = 1
 
 # Class: XPlaneHeader
 # Create an OBJ header.
@@ -358,24 +369,73 @@ class XPlaneHeader():
             self.attributes.add(XPlaneAttribute(attr.name, attr.value))
 
 
-    def _compositeNormalTextureNeedsRecompile(self, compositePath, sourcePaths):
+    # Method: _getCompositeManifest
+    # A composite texture is cached by the content of its sources, so checkouts and copies
+    # that reset mtimes don't cause needless recompositing. The manifest is stored next to the composite,
+    # see <COMPOSITE_MANIFEST_EXTENSION>.
+    #
+    # Parameters:
+    #   list sourcePaths - Paths of the source textures, as chosen by the user
+    #   string mode - Composite mode, one of 'nm', 'nm_spec' and 'spec'
+    #
+    # Returns:
+    #   dict - The manifest for the current sources without the hash of the composite itself,
+    #   None if a source can't be read
+    def _getCompositeManifest(self, sourcePaths, mode:str)->Optional[dict]:
+        sourceHashes = []
+
+        for sourcePath in sourcePaths:
+            try:
+                sourceHashes.append(getFileHash(resolveBlenderPath(sourcePath)))
+            except OSError:
+                return None
+
+        return {
+            'version': COMPOSITE_MANIFEST_VERSION,
+            'mode': mode,
+            'sources': sourceHashes
+        }
+
+    # Method: _compositeNormalTextureNeedsRecompile
+    #
+    # Parameters:
+    #   string compositePath - Path of the composite texture
+    #   dict manifest - Manifest of the current sources, see <_getCompositeManifest>
+    #
+    # Returns:
+    #   bool - False if the composite exists, is unchanged and was made from the same sources in the same mode
+    def _compositeNormalTextureNeedsRecompile(self, compositePath, manifest:Optional[dict])->bool:
         compositePath = resolveBlenderPath(compositePath)
 
-        if not os.path.exists(compositePath):
+        if manifest is None or not os.path.exists(compositePath):
             return True
-        else:
-            compositeTime = os.path.getmtime(compositePath)
 
-            for sourcePath in sourcePaths:
-                sourcePath = resolveBlenderPath(sourcePath)
+        try:
+            with open(compositePath + COMPOSITE_MANIFEST_EXTENSION, 'r') as f:
+                storedManifest = json.load(f)
+
+            compositeHash = getFileHash(compositePath)
+        except (OSError, ValueError):
+            return True
+
+        return storedManifest != dict(manifest, composite = compositeHash)
 
-                if os.path.exists(sourcePath):
-                    sourceTime = os.path.getmtime(sourcePath)
+    # Method: _writeCompositeManifest
+    #
+    # Parameters:
+    #   string savepath - Absolute path of the freshly saved composite texture
+    #   dict manifest - Manifest of the sources it was made from, see <_getCompositeManifest>
+    def _writeCompositeManifest(self, savepath:str, manifest:Optional[dict]):
+        manifestPath = savepath + COMPOSITE_MANIFEST_EXTENSION
 
-                    if sourceTime > compositeTime:
-                        return True
+        if manifest is None:
+            # a stale manifest must not claim this composite
+            if os.path.exists(manifestPath):
+                os.remove(manifestPath)
+            return
 
-        return False
+        with open(manifestPath, 'w') as f:
+            json.dump(dict(manifest, composite = getFileHash(savepath)), f, indent = 4, sort_keys = True)
 
     def _getCompositeNormalTexture(self, textureNormal, textureSpecular):
         normalImage = None
@@ -383,6 +443,7 @@ class XPlaneHeader():
         texture = None
         image = None
         filepath = None
+        manifest = None
         channels = 4
 
         if textureNormal:
@@ -397,7 +458,9 @@ class XPlaneHeader():
             filepath = texture = filename + '_nm' + extension
             channels = 3
 
-            if self._compositeNormalTextureNeedsRecompile(filepath, (textureNormal)):
+            manifest = self._getCompositeManifest((textureNormal,), 'nm')
+
+            if self._compositeNormalTextureNeedsRecompile(filepath, manifest):
                 image = normalWithoutAlpha(normalImage, normalImage.name + '_nm')
 
         # normal + specular
@@ -406,7 +469,9 @@ class XPlaneHeader():
             filepath = texture = filename + '_nm_spec' + extension
             channels = 4
 
-            if self._compositeNormalTextureNeedsRecompile(filepath, (textureNormal, textureSpecular)):
+            manifest = self._getCompositeManifest((textureNormal, textureSpecular), 'nm_spec')
+
+            if self._compositeNormalTextureNeedsRecompile(filepath, manifest):
                 image = combineSpecularAndNormal(specularImage, normalImage, normalImage.name + '_nm_spec')
 
         # specular only
@@ -415,7 +480,9 @@ class XPlaneHeader():
             filepath = texture = filename + '_spec' + extension
             channels = 1
 
-            if self._compositeNormalTextureNeedsRecompile(filepath, (textureSpecular)):
+            manifest = self._getCompositeManifest((textureSpecular,), 'spec')
+
+            if self._compositeNormalTextureNeedsRecompile(filepath, manifest):
                 image = specularToGrayscale(specularImage, specularImage.name + '_spec')
 
         if image:
@@ -430,6 +497,8 @@ class XPlaneHeader():
                 bpy.context.scene.render.image_settings.color_mode = 'BW'
             image.save_render(savepath, bpy.context.scene)
             image.filepath = filepath
+            indexImage(image)
+            self._writeCompositeManifest(savepath, manifest)
 
             # restore color_mode
             bpy.context.scene.render.image_settings.color_mode = color_mode
@@ -482,31 +551,36 @@ class XPlaneHeader():
                     if textureSpecular == None and mat.textureSpecular:
                         textureSpecular = mat.textureSpecular
 
-        # now go through all textures again and list any objects with different textures
+        # now go through all textures again and list any objects with different textures,
+        # comparing the canonical paths so '//' and absolute paths to the same file are equal
+        blenddir = os.path.dirname(bpy.context.blend_data.filepath)
+        canonicalTextures = {
+            path: getCanonicalPath(path, blenddir)
+            for path in (texture, textureLit, textureNormal, textureDraped, textureDrapedNormal) if path
+        }
+
+        def usesTexture(texpath, chosenTexture):
+            return getCanonicalPath(texpath, blenddir) == canonicalTextures[chosenTexture]
+
         for xplaneObject in xplaneObjects:
             # skip non-mesh objects and objects without a xplane bone
             if xplaneObject.type == 'MESH' and xplaneObject.xplaneBone:
                 mat = xplaneObject.material
 
                 if mat.options.draped:
-                    if textureDraped and \
-                       self._getCanonicalTexturePath(textureDraped) != self._getCanonicalTexturePath(mat.texture):
+                    if textureDraped and not usesTexture(mat.texture, textureDraped):
                         logger.warn('Material "%s" in Object "%s" must use the draped texture "%s" but uses "%s".' % (mat.name, xplaneObject.name, textureDraped, mat.texture))
 
-                    if textureDrapedNormal and \
-                       self._getCanonicalTexturePath(textureDrapedNormal) != self._getCanonicalTexturePath(mat.textureNormal):
+                    if textureDrapedNormal and not usesTexture(mat.textureNormal, textureDrapedNormal):
                         logger.warn('Material "%s" in Object "%s" must use the draped normal/specular texture "%s" but uses "%s".' % (mat.name, xplaneObject.name, textureDrapedNormal, mat.textureNormal))
                 elif not mat.options.panel and not mat.options.solid_camera:
-                    if texture and \
-                       self._getCanonicalTexturePath(texture) != self._getCanonicalTexturePath(mat.texture):
+                    if texture and not usesTexture(mat.texture, texture):
                         logger.warn('Material "%s" in Object "%s" must use the color texture "%s" but uses "%s".' % (mat.name, xplaneObject.name, texture, mat.texture))
 
-                    if textureLit and \
-                       self._getCanonicalTexturePath(textureLit) != self._getCanonicalTexturePath(mat.textureLit):
+                    if textureLit and not usesTexture(mat.textureLit, textureLit):
                         logger.warn('Material "%s" in Object "%s" must use the night/lit texture "%s" but uses "%s".' % (mat.name, xplaneObject.name, textureLit, mat.textureLit))
 
-                    if textureNormal and \
-                       self._getCanonicalTexturePath(textureNormal) != self._getCanonicalTexturePath(mat.textureNormal):
+                    if textureNormal and not usesTexture(mat.textureNormal, textureNormal):
                         logger.warn('Material "%s" in Object "%s" must use the normal/specular texture "%s" but uses "%s".' % (mat.name, xplaneObject.name, textureNormal, mat.textureNormal))
 
         # generate composite normal texture if needed
@@ -534,41 +608,20 @@ class XPlaneHeader():
     # Returns:
     #   string - the resource path relative to the exported OBJ
     def getPathRelativeToOBJ(self, respath:str, exportdir:str, blenddir:str)->str:
-        # blender stores relative paths on UNIX with leading double slash
-        if respath[0:2] == '//':
-            respath = respath[2:]
-
-        if os.path.isabs(respath):
-            respath = os.path.abspath(os.path.normpath(respath))
-        else:
-            respath = os.path.abspath(os.path.normpath(os.path.join(blenddir, respath)))
+        return getRelativePath(respath, exportdir, blenddir)
 
-        respath = os.path.relpath(respath, exportdir)
-
-        #Replace any \ separators if you're on Windows. For other platforms this does nothing
-        return respath.replace("\\","/")
-
-    # Method: _getCanonicalTexturePath
-    # Returns normalized (canonical) path to texture
+    # Method: writeTo
+    # Writes the OBJ header to out.
     #
     # Parameters:
-    #   string texpath - the relative or absolute texture path as chosen by the user
+    #   out - A file-like object with a write(str) method
     #
     # Returns:
-    #   string - the absolute/normalized path to the texture
-    def _getCanonicalTexturePath(self, texpath):
-        blenddir = os.path.dirname(bpy.context.blend_data.filepath)
-
-        if texpath[0:2] == '//':
-            texpath = texpath[2:]
-
-        if os.path.isabs(texpath):
-            texpath = os.path.abspath(os.path.normpath(texpath))
-        else:
-            texpath = os.path.abspath(os.path.normpath(os.path.join(blenddir, texpath)))
-
-        return texpath
-
+    #   int - The number of characters written.
+    def writeTo(self, out):
+        o = self.write()
+        out.write(o)
+        return len(o)
 
     # Method: write
     # Returns the OBJ header.
@@ -1,5 +1,5 @@
 import copy
-from typing import Tuple
+from typing import Dict, List, Tuple
 
 import bpy
 import mathutils
@@ -47,23 +47,35 @@ class XPlaneKeyframe():
     #   int index - The index of this keyframe in the <object> keyframe list.
     #   string dataref - Path of the dataref this keyframe refers to.
     #   XPlaneBone xplaneBone - An <XPlaneBone>
-    def __init__(self, keyframe, index, dataref, xplaneBone):
-        currentFrame = bpy.context.scene.frame_current
+    #   bool sample - (default True) If False <sampleCurrentFrame> must be called later on, on <frame>.
+    #                 See <XPlaneKeyframeSampler>
+    def __init__(self, keyframe, index, dataref, xplaneBone, sample = True):
         self.dataref = dataref
         self.index = index
         self.value = keyframe.co[1]
 
+        # TODO: support subframes?
+        self.frame = int(round(keyframe.co[0]))
+
+        if sample:
+            # goto keyframe and read out object values
+            currentFrame = bpy.context.scene.frame_current
+            bpy.context.scene.frame_set(frame = self.frame)
+            self.sampleCurrentFrame(xplaneBone)
+            bpy.context.scene.frame_set(frame = currentFrame)
+
+    # Method: sampleCurrentFrame
+    # Reads <location>, <rotation> and <scale> from Blender. The scene must already be on <frame>.
+    #
+    # Parameters:
+    #   XPlaneBone xplaneBone - The <XPlaneBone> this keyframe belongs to
+    def sampleCurrentFrame(self, xplaneBone):
         if xplaneBone.blenderBone:
             # we need the pose bone
             blenderObject = xplaneBone.blenderObject.pose.bones[xplaneBone.blenderBone.name]
         else:
             blenderObject = xplaneBone.blenderObject
 
-        # goto keyframe and read out object values
-        # TODO: support subframes?
-        self.frame = int(round(keyframe.co[0]))
-        bpy.context.scene.frame_set(frame = self.frame)
-
         self.location = mathutils.Vector([round(comp,KEYFRAME_PRECISION) for comp in copy.copy(blenderObject.location)])
         assert isinstance(self.location,mathutils.Vector)
 		
@@ -98,7 +110,6 @@ class XPlaneKeyframe():
             assert isinstance(self.rotation, mathutils.Euler)
 
         self.scale = copy.copy(blenderObject.scale)
-        bpy.context.scene.frame_set(frame = currentFrame)
 
     def __str__(self):
     	# TODO: We aren't printing out the bone, or saving it, because we haven't solved the deepcopy
@@ -165,3 +176,54 @@ class XPlaneKeyframe():
             keyframe.rotation = keyframe.rotation.to_quaternion()
             keyframe.rotationMode = "QUATERNION"
             return keyframe
+
+# Class: XPlaneKeyframeSampler
+# Samples the <XPlaneKeyframes> of many <XPlaneBones> frame by frame.
+#
+# frame_set evaluates the whole scene, so instead of jumping to every keyframe of every bone
+# the sampler visits each distinct frame once and samples all keyframes on it.
+class XPlaneKeyframeSampler():
+    def __init__(self):
+        # dict - The keys are frames and the values are lists of (<XPlaneKeyframe>, <XPlaneBone>)
+        self.keyframes = {} # type: Dict[int,List[Tuple[XPlaneKeyframe,'XPlaneBone']]]
+
+        # list - Callables run after sampling, in the order they were added
+        self.callbacks = []
+
+    # Method: add
+    # Schedules a keyframe created with sample=False for sampling.
+    #
+    # Parameters:
+    #   XPlaneKeyframe keyframe - The <XPlaneKeyframe>
+    #   XPlaneBone xplaneBone - The <XPlaneBone> the keyframe belongs to
+    def add(self, keyframe, xplaneBone):
+        self.keyframes.setdefault(keyframe.frame, []).append((keyframe, xplaneBone))
+
+    # Method: addCallback
+    # Adds a callable that is run once all keyframes are sampled.
+    #
+    # Parameters:
+    #   callback - A callable without arguments
+    def addCallback(self, callback):
+        self.callbacks.append(callback)
+
+    # Method: sample
+    # Samples all scheduled keyframes, restores the current frame and runs the callbacks.
+    def sample(self):
+        if len(self.keyframes):
+            currentFrame = bpy.context.scene.frame_current
+
+            for frame in sorted(self.keyframes):
+                bpy.context.scene.frame_set(frame = frame)
+
+                for keyframe, xplaneBone in self.keyframes[frame]:
+                    keyframe.sampleCurrentFrame(xplaneBone)
+
+            bpy.context.scene.frame_set(frame = currentFrame)
+
+        callbacks = self.callbacks
+        self.keyframes = {}
+        self.callbacks = []
+
+        for callback in callbacks:
+            callback()
@@ -47,3 +47,19 @@ class XPlaneLights():
             o += l + '\n'
 
         return o
+
+    # Method: writeTo
+    # Writes the OBJ lights table to out.
+    #
+    # Parameters:
+    #   out - A file-like object with a write(str) method
+    #
+    # Returns:
+    #   int - The number of characters written.
+    def writeTo(self, out):
+        written = 0
+        for l in self.lines:
+            out.write(l + '\n')
+            written += len(l) + 1
+
+        return written
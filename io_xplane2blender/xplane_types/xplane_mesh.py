@@ -1,4 +1,6 @@
 import array
+import io
+import itertools
 import time
 import re
 
@@ -8,6 +10,38 @@ from ..xplane_helpers import floatToStr, logger
 from ..xplane_constants import *
 from .xplane_face import XPlaneFace
 
+# Blender ships NumPy with its Python, but we still fall back
+# to the per-face path if it is missing for some reason
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Constant: VT_CHUNK_SIZE
+# Number of VT rows <iterVTChunks> formats at once
+VT_CHUNK_SIZE = 1024
+
+# Function: stripVTTrailingZeros
+# Strips the trailing zeros, and then a trailing '.', of every "%.8f" formatted component
+# in a chunk of VT rows. Every component must be followed by a tab, this is what
+# floatToStr would do to each component, but for the whole chunk at once.
+#
+# Every component has a '.' and 8 decimals, so a component loses at most 8 zeros
+# per call and the '.' stops us from ever eating into the integer part.
+#
+# Parameters:
+#   string chunk - The formatted VT rows
+#
+# Returns:
+#   string - The VT rows without trailing zeros.
+def stripVTTrailingZeros(chunk:str)->str:
+    for i in range(8):
+        if "0\t" not in chunk:
+            break
+        chunk = chunk.replace("0\t", "\t")
+
+    return chunk.replace(".\t", "\t")
+
 # Class: XPlaneMesh
 # Creates the OBJ meshes.
 class XPlaneMesh():
@@ -22,6 +56,13 @@ class XPlaneMesh():
         self.globalindex = 0
         self.debug = []
 
+        # dict - Maps a vertice (as a tuple) to the index of its first occurance, see <getDupliVerticeIndex>
+        self._dupliVertices = {}
+        # int - The startIndex <_dupliVertices> was built for
+        self._dupliVerticesStart = -1
+        # int - The index of the first vertice not yet in <_dupliVertices>
+        self._dupliVerticesEnd = -1
+
     # Method: collectXPlaneObjects
     # Fills the <vertices> and <indices> from a list of <XPlaneObjects>.
     # This method works recursively on the children of each <XPlaneObject>.
@@ -71,8 +112,12 @@ class XPlaneMesh():
 
                 d = {'name': xplaneObject.name,'obj_face': 0,'faces': len(mesh_faces),'quads': 0,'vertices': len(mesh.vertices),'uvs': 0}
 
+                if len(mesh_faces) > 0 and numpy is not None and hasattr(mesh, 'polygons'):
+                    self.collectTessFacesBulk(mesh, uvFaces, supports_split_normals, first_vertice_of_this_xplaneObject, d)
+                    xplaneObject.indices[1] = len(self.indices)
+
                 # convert faces to triangles
-                if len(mesh_faces) > 0:
+                elif len(mesh_faces) > 0:
                     tempfaces = []
 
                     for i in range(0, len(mesh_faces)):
@@ -165,13 +210,119 @@ class XPlaneMesh():
                 if d['faces'] > 0:
                     tris_to_quads = d['obj_faces'] / d['faces']
 
-                logger.info('%s: faces %d | xplaneObject-faces %d | tris-to-quads ratio %6.2f | indices %d | vertices %d' % (d['name'],d['faces'],d['obj_faces'],tris_to_quads,d['end_index']-d['start_index'],d['vertices']))
+                logger.info('%s: faces %d | xplaneObject-faces %d | tris-to-quads ratio %6.2f | indices %d | vertices %d', d['name'],d['faces'],d['obj_faces'],tris_to_quads,d['end_index']-d['start_index'],d['vertices'])
 
-            logger.info('POINT COUNTS: faces %d - vertices %d - indices %d' % (len(self.faces),len(self.vertices),len(self.indices)))
+            logger.info('POINT COUNTS: faces %d - vertices %d - indices %d', len(self.indices) // 3,len(self.vertices),len(self.indices))
+
+    # Method: collectTessFacesBulk
+    # Fills <vertices> and <indices> from the tessfaces of a BMesh based Blender mesh.
+    #
+    # This produces exactly the same tables as the per-face path in <collectXPlaneObjects>,
+    # but reads the mesh with foreach_get into flat buffers and does the triangulation, the
+    # axis swap and the winding reversal as whole-array operations. No <XPlaneFaces> are created.
+    #
+    # Parameters:
+    #   mesh - Blender mesh with up to date tessfaces (and split normals if supported)
+    #   uvFaces - The Blender UV faces as returned by <getUVFaces> or None
+    #   bool supports_split_normals - True if the tessfaces have split normals
+    #   int startIndex - Index of the first vertice of this object, used for duplicate detection
+    #   dict d - The debug info dict of this object
+    def collectTessFacesBulk(self, mesh, uvFaces, supports_split_normals, startIndex, d):
+        tessfaces = mesh.tessfaces
+        numFaces = len(tessfaces)
+
+        # Tessfaces always have 4 vertex slots, a triangle has 0 in its last one.
+        # Blender guarantees a quad never has vertex 0 in its last slot
+        facesVertices = numpy.empty(numFaces * 4, dtype=numpy.int32)
+        tessfaces.foreach_get('vertices_raw', facesVertices)
+        facesVertices.shape = (numFaces, 4)
+
+        facesSmooth = numpy.empty(numFaces, dtype=numpy.bool_)
+        tessfaces.foreach_get('use_smooth', facesSmooth)
+
+        facesNormals = numpy.empty(numFaces * 3, dtype=numpy.float32)
+        tessfaces.foreach_get('normal', facesNormals)
+        facesNormals.shape = (numFaces, 3)
+
+        coords = numpy.empty(len(mesh.vertices) * 3, dtype=numpy.float32)
+        mesh.vertices.foreach_get('co', coords)
+        coords.shape = (len(mesh.vertices), 3)
+
+        isQuad = facesVertices[:, 3] != 0
+        numQuads = int(numpy.count_nonzero(isQuad))
+
+        # Every face becomes one triangle, quads get a second one right after it.
+        # As we are reversing the winding, the corners (of the original face) are emitted
+        # in the order 2,1,0 for the first and 0,3,2 for the second triangle
+        trianglesPerFace = 1 + isQuad.astype(numpy.int64)
+        triangleFaces = numpy.repeat(numpy.arange(numFaces), trianglesPerFace)
+        isSecondTriangle = numpy.arange(len(triangleFaces)) - numpy.repeat(numpy.cumsum(trianglesPerFace) - trianglesPerFace, trianglesPerFace)
+        triangleCorners = numpy.where(isSecondTriangle[:, numpy.newaxis] == 1,
+                                      numpy.array((0, 3, 2)),
+                                      numpy.array((2, 1, 0)))
+
+        # per emitted vertice: the face and the index of the face corner (face * 4 + corner)
+        vertFaces = numpy.repeat(triangleFaces, 3)
+        vertCorners = (triangleFaces[:, numpy.newaxis] * 4 + triangleCorners).ravel()
+        vertIndices = facesVertices.ravel()[vertCorners]
+
+        if supports_split_normals:
+            splitNormals = numpy.empty(numFaces * 12, dtype=numpy.float32)
+            tessfaces.foreach_get('split_normals', splitNormals)
+            smoothNormals = splitNormals.reshape(numFaces * 4, 3)[vertCorners]
+        else:
+            vertexNormals = numpy.empty(len(mesh.vertices) * 3, dtype=numpy.float32)
+            mesh.vertices.foreach_get('normal', vertexNormals)
+            smoothNormals = vertexNormals.reshape(len(mesh.vertices), 3)[vertIndices]
+
+        # use smoothed vertex normals or the flat face normal
+        normals = numpy.where(facesSmooth[vertFaces][:, numpy.newaxis], smoothNormals, facesNormals[vertFaces])
+        co = coords[vertIndices]
+
+        vt = numpy.zeros((len(vertCorners), 8), dtype=numpy.float32)
+        vt[:, 0] = co[:, 0]
+        vt[:, 1] = co[:, 2]
+        vt[:, 2] = -co[:, 1]
+        vt[:, 3] = normals[:, 0]
+        vt[:, 4] = normals[:, 2]
+        vt[:, 5] = -normals[:, 1]
+
+        if uvFaces != None:
+            uvs = numpy.empty(numFaces * 8, dtype=numpy.float32)
+            uvFaces.foreach_get('uv_raw', uvs)
+            vt[:, 6:8] = uvs.reshape(numFaces * 4, 2)[vertCorners]
+            d['uvs'] += numFaces
+
+        d['quads'] += numQuads
+        d['obj_faces'] = len(triangleFaces)
+
+        # Python floats of the float32 values, just like reading them one by one through RNA
+        vertices = vt.tolist()
+
+        if bpy.context.scene.xplane.optimize:
+            for vert in vertices:
+                index = self.getDupliVerticeIndex(vert, startIndex)
+
+                if index == -1:
+                    index = self.globalindex
+                    self.vertices.append(vert)
+                    self.globalindex += 1
+
+                self.indices.append(index)
+        else:
+            self.indices.extend(range(self.globalindex, self.globalindex + len(vertices)))
+            self.vertices.extend(vertices)
+            self.globalindex += len(vertices)
 
     # Method: getDupliVerticeIndex
     # Returns the index of a vertice duplicate if any.
     #
+    # The lookup is backed by a dict of the vertices from startIndex on, so
+    # optimizing a mesh takes linear instead of quadratic time. The dict is
+    # rebuilt when startIndex changes (a new object starts) and is caught up with
+    # any vertices appended since the last call, so the first match is always
+    # the lowest index, just as a linear scan would find it.
+    #
     # Parameters:
     #   v - The OBJ vertice.
     #   int startIndex - (default=0) From which index to start searching for duplicates.
@@ -179,24 +330,18 @@ class XPlaneMesh():
     # Returns:
     #   int - Index of the duplicate or -1 if none was found.
     def getDupliVerticeIndex(self, v, startIndex = 0):
-        l = len(self.vertices)
-
-        for i in range(startIndex, l):
-            match = True
-            ii = 0
-            vl = len(v)
-
-            while ii < vl:
-                if self.vertices[i][ii] != v[ii]:
-                    match = False
-                    ii = vl
+        if startIndex != self._dupliVerticesStart or self._dupliVerticesEnd > len(self.vertices):
+            self._dupliVertices = {}
+            self._dupliVerticesStart = startIndex
+            self._dupliVerticesEnd = startIndex
 
-                ii += 1
+        dupliVertices = self._dupliVertices
+        for i in range(self._dupliVerticesEnd, len(self.vertices)):
+            dupliVertices.setdefault(tuple(self.vertices[i]), i)
 
-            if match:
-                return i
+        self._dupliVerticesEnd = max(self._dupliVerticesEnd, len(self.vertices))
 
-        return -1
+        return dupliVertices.get(tuple(v), -1)
 
 
     # Method: getUVFaces
@@ -326,39 +471,34 @@ class XPlaneMesh():
 
         return fv
 
+    # Method: getVerticesArray
+    #
+    # Returns:
+    #   array - <vertices> flattened into an array('f'), 8 components per vertex
+    def getVerticesArray(self)->array.array:
+        return array.array('f', itertools.chain.from_iterable(self.vertices))
+
     # Method: writeVertices
     # Returns the OBJ vertex table by iterating <vertices>.
     #
+    # Parameters:
+    #   bool debug - If True every row gets its index as comment, defaults to <getDebug>
+    #
     # Returns:
     #   string - The OBJ vertex table.
-    def writeVertices(self):
-        ######################################################################
-        # WARNING! This is a hot path! So don't change it without profiling! #
-        ######################################################################
-        o = bytearray()
-        #print("Begin XPlaneMesh.writeVertices")
-        #start = time.perf_counter()
-        debug = getDebug()
-
-        vt_array = array.array('f', [round(component,8) for vertice in self.vertices for component in vertice])
-        #Loop through every line, format it's 8 components, use rstrip, if statement for 10.00000000->10.0
-        #52-60 seconds
-        for i,line in enumerate(range(0,len(vt_array),8)):
-            o += b"VT"
-            for component in  vt_array[line:line+8]:
-                sb = bytes("\t%.8f" % component,"utf-8").rstrip(b'0')
-                if sb[-1] == 46:#'.':
-                    o += sb[:-1]
-                else:
-                    o += sb
+    def writeVertices(self, debug = None):
+        return ''.join(self.iterVerticesChunks(debug))
 
-            if debug:
-                o += bytes("\t# %d\n" % i,"utf-8")
-            else:
-                o += b"\n"
+    # Method: iterVerticesChunks
+    # Yields the OBJ vertex table in chunks of <VT_CHUNK_SIZE> rows, see <iterVTChunks>.
+    #
+    # Parameters:
+    #   bool debug - If True every row gets its index as comment, defaults to <getDebug>
+    def iterVerticesChunks(self, debug = None):
+        if debug is None:
+            debug = getDebug()
 
-        #print("end XPlaneMesh.writeVertices " + str(time.perf_counter()-start))
-        return o.decode("utf-8")
+        return iterVTChunks(self.getVerticesArray(), debug)
 
     # Method: writeIndices
     # Returns the OBJ indices table by itering <indices>.
@@ -366,32 +506,126 @@ class XPlaneMesh():
     # Returns:
     #   string - The OBJ indices table.
     def writeIndices(self):
-        ######################################################################
-        # WARNING! This is a hot path! So don't change it without profiling! #
-        ######################################################################
-        o=''
-        #print("Begin XPlaneMesh.writeIndices")
-        #start = time.perf_counter()
-
-        s_idx10 = "IDX10\t%d\t%d\t%d\t%d\t%d\t%d\t%d\t%d\t%d\t%d\n"
-        s_idx   = "IDX\t%d\n"
-        partition_point = len(self.indices) - (len(self.indices) % 10)
-
-        if len(self.indices) >= 10:
-            o += ''.join([s_idx10 % (*self.indices[i:i+10],) for i in range(0,partition_point-1,10)])
-
-        o += ''.join([s_idx % (self.indices[i]) for i in range(partition_point,len(self.indices))])
-        #print("End XPlaneMesh.writeIndices: " + str(time.perf_counter()-start))
-        return o
-
-    def write(self):
-        o = ''
-        debug = False
-
-        verticesOut = self.writeVertices()
-        o += verticesOut
-        if len(verticesOut):
-            o += '\n'
-        o += self.writeIndices()
-
-        return o
+        return ''.join(iterIDXChunks(self.indices))
+
+    # Method: write
+    # Returns the OBJ vertex and indices tables.
+    #
+    # Parameters:
+    #   bool debug - If True every VT row gets its index as comment, defaults to <getDebug>
+    #
+    # Returns:
+    #   string - The OBJ vertex and indices tables.
+    def write(self, debug = None):
+        o = io.StringIO()
+        self.writeTo(o, debug)
+        return o.getvalue()
+
+    # Method: writeTo
+    # Writes the OBJ vertex and indices tables to out, chunk by chunk.
+    #
+    # Parameters:
+    #   out - A file-like object with a write(str) method
+    #   bool debug - If True every VT row gets its index as comment, defaults to <getDebug>
+    #
+    # Returns:
+    #   int - The number of characters written.
+    def writeTo(self, out, debug = None):
+        if debug is None:
+            debug = getDebug()
+
+        return writeTablesTo(out, self.getVerticesArray(), self.indices, debug)
+
+# The functions below only work on plain Python data and never touch bpy,
+# so <XPlaneFileSnapshot> can run them in another process.
+
+# Function: iterVTChunks
+# Yields the OBJ vertex table in chunks of <VT_CHUNK_SIZE> rows.
+#
+# Rows are formatted a chunk at a time with one %-format call and the
+# trailing zeros are stripped from the whole chunk with <stripVTTrailingZeros>.
+#
+# Parameters:
+#   array vt_array - The vertices as array('f'), 8 components per vertex, see <XPlaneMesh.getVerticesArray>
+#   bool debug - If True every row gets its index as comment
+#
+# Yields:
+#   string - Part of the OBJ vertex table.
+def iterVTChunks(vt_array, debug):
+    ######################################################################
+    # WARNING! This is a hot path! So don't change it without profiling! #
+    # See tests/xplane_types/xplane_mesh/write_vertices_performance      #
+    ######################################################################
+
+    # Every component already is a float32 (read from Blender), so round(component,8)
+    # before the cast to array('f') would be a no-op for the "%.8f" output: for |component| >= 0.125
+    # the cast gives back the component itself, below that the cast can't move it across a
+    # rounding boundary of the 8th decimal. Skipping it saves a round() per component.
+    chunk_len = VT_CHUNK_SIZE * 8
+
+    # The tab before the newline or debug comment lets stripVTTrailingZeros
+    # treat the last component like all others
+    if debug:
+        row_fmt = "VT" + "\t%.8f" * 8 + "\t# %d\n"
+        for start in range(0, len(vt_array), chunk_len):
+            yield stripVTTrailingZeros(''.join([row_fmt % (*vt_array[line:line+8], line // 8)
+                                                for line in range(start, min(start+chunk_len, len(vt_array)), 8)]))
+        return
+
+    chunk_fmt = ("VT" + "\t%.8f" * 8 + "\t\n") * VT_CHUNK_SIZE
+
+    for start in range(0, len(vt_array), chunk_len):
+        chunk = vt_array[start:start+chunk_len]
+        if len(chunk) < chunk_len:
+            chunk_fmt = chunk_fmt[:len(chunk_fmt) // VT_CHUNK_SIZE * (len(chunk) // 8)]
+        yield stripVTTrailingZeros(chunk_fmt % tuple(chunk)).replace("\t\n", "\n")
+
+# Function: iterIDXChunks
+# Yields the OBJ indices table in chunks of up to <VT_CHUNK_SIZE> IDX10 lines.
+#
+# Parameters:
+#   indices - Sequence of ints
+#
+# Yields:
+#   string - Part of the OBJ indices table.
+def iterIDXChunks(indices):
+    ######################################################################
+    # WARNING! This is a hot path! So don't change it without profiling! #
+    ######################################################################
+    s_idx10 = "IDX10\t%d\t%d\t%d\t%d\t%d\t%d\t%d\t%d\t%d\t%d\n"
+    s_idx   = "IDX\t%d\n"
+    partition_point = len(indices) - (len(indices) % 10)
+    chunk_len = VT_CHUNK_SIZE * 10
+
+    for start in range(0, partition_point, chunk_len):
+        yield ''.join([s_idx10 % (*indices[i:i+10],) for i in range(start, min(start+chunk_len, partition_point), 10)])
+
+    if partition_point < len(indices):
+        yield ''.join([s_idx % (indices[i]) for i in range(partition_point,len(indices))])
+
+# Function: writeTablesTo
+# Writes the OBJ vertex and indices tables to out, chunk by chunk.
+#
+# Parameters:
+#   out - A file-like object with a write(str) method
+#   array vt_array - The vertices, see <iterVTChunks>
+#   indices - Sequence of ints
+#   bool debug - If True every VT row gets its index as comment
+#
+# Returns:
+#   int - The number of characters written.
+def writeTablesTo(out, vt_array, indices, debug):
+    written = 0
+    for chunk in iterVTChunks(vt_array, debug):
+        out.write(chunk)
+        written += len(chunk)
+
+    if len(vt_array):
+        out.write('\n')
+        written += 1
+
+    for chunk in iterIDXChunks(indices):
+        out.write(chunk)
+        written += len(chunk)
+
+    return written
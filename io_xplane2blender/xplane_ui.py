@@ -179,6 +179,7 @@ def empty_layout(self:bpy.types.UILayout, empty_obj:bpy.types.Object):
 def scene_layout(self, scene):
     layout = self.layout
     layout.row().operator("scene.export_to_relative_dir", icon="EXPORT")
+    layout.row().operator("scene.export_changed_to_relative_dir", icon="EXPORT")
     layout.row().prop(scene.xplane, "version")
     layout.row().prop(scene.xplane, "exportMode")
     layout.row().prop(scene.xplane, "compositeTextures")
@@ -217,6 +218,8 @@ def scene_layout(self, scene):
     advanced_box.label("Advanced Settings")
     advanced_column = advanced_box.column()
     advanced_column.prop(scene.xplane, "optimize")
+    advanced_column.prop(scene.xplane, "parallelExport")
+    advanced_column.prop(scene.xplane, "skipUnchangedFiles")
     advanced_column.prop(scene.xplane, "debug")
 
     if scene.xplane.debug:
@@ -237,6 +240,7 @@ def scene_dev_layout(self,scene,layout):
         dev_box_column.prop(scene.xplane, "dev_enable_breakpoints")
         dev_box_column.prop(scene.xplane, "dev_continue_export_on_error")
         dev_box_column.prop(scene.xplane, "dev_export_as_dry_run")
+        dev_box_column.prop(scene.xplane, "dev_profile_export")
         #Exact same operator, more convient place 
         dev_box_column.operator("scene.export_to_relative_dir", icon="EXPORT")
         dev_box_column.operator("scene.dev_layer_names_from_objects")
@@ -1,11 +1,22 @@
 import argparse
+import concurrent.futures
 import glob
+import json
 import os
+import queue
 import re
 import shutil
 import subprocess
 import sys
+import threading
 import time
+from typing import Dict, List, Optional, Tuple
+
+# Must be kept in sync with io_xplane2blender/tests/test_worker.py
+WORKER_RESULT_PREFIX = "XPLANE2BLENDER WORKER RESULT: "
+
+# Must be kept in sync with io_xplane2blender/tests/__init__.py
+TMP_DIR_ENV_VAR = "XPLANE2BLENDER_TEST_TMP_DIR"
 
 
 def clean_tmp_folder():
@@ -21,6 +32,97 @@ def clean_tmp_folder():
     except:
         pass
 
+def _make_blender_args(argv)->list:
+    blender_args = [
+        argv.blender,
+        '--addons',
+        'io_xplane2blender',
+        '--factory-startup',
+        '-noaudio',
+        '-b'
+    ]
+
+    if argv.no_factory_startup:
+        blender_args.remove('--factory-startup')
+
+    return blender_args
+
+class BlenderWorker():
+    '''
+    A long-lived Blender running io_xplane2blender/tests/test_worker.py,
+    which runs one test file after another, loading a clean state for each
+    '''
+    def __init__(self, argv, env:Optional[Dict[str,str]] = None):
+        blender_args = _make_blender_args(argv)
+        blender_args.extend([
+            '--python-expr',
+            'from io_xplane2blender.tests import test_worker; test_worker.main()'
+        ])
+
+        if argv.force_blender_debug:
+            blender_args.append('--debug')
+
+        blender_args.extend(['--']+sys.argv[1:])
+
+        if (not argv.quiet and
+                (argv.force_blender_debug or argv.force_xplane_debug)):
+            print(' '.join(blender_args))
+
+        self.process = subprocess.Popen(
+                blender_args,
+                stdin = subprocess.PIPE,
+                stdout = subprocess.PIPE,
+                stderr = subprocess.STDOUT,
+                universal_newlines = True,
+                env = env)
+
+    def is_alive(self)->bool:
+        return self.process.poll() is None
+
+    def run(self, pyFile:str, blendFile:Optional[str])->Tuple[str, Optional[Dict[str,int]]]:
+        '''
+        Returns the output of the test file and its counts,
+        or None for the counts if the worker died while running it
+        '''
+        out = []
+        try:
+            self.process.stdin.write(json.dumps({"pyFile": pyFile, "blendFile": blendFile}) + '\n')
+            self.process.stdin.flush()
+        except (BrokenPipeError, OSError):
+            return '', None
+
+        for line in self.process.stdout:
+            if line.startswith(WORKER_RESULT_PREFIX):
+                return ''.join(out), json.loads(line[len(WORKER_RESULT_PREFIX):])
+            out.append(line)
+
+        self.process.wait()
+        return ''.join(out), None
+
+    def close(self):
+        try:
+            self.process.stdin.close()
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.wait()
+
+def _parse_results(out:str)->Optional[Dict[str,int]]:
+    '''
+    Rather than mess with fancy ways to pass back test results
+    we have a stupid simple solution: Print a special string
+    at the end and parse it here.
+
+    Unfortunately, the REGEX must be duplicated across both files
+    due to some problems with importing it from the test module
+    '''
+    TEST_RESULTS_REGEX = re.compile(r"RESULT: After (?P<testsRun>\d+) tests got (?P<errors>\d+) errors, (?P<failures>\d+) failures, and (?P<skipped>\d+) skipped")
+    results = re.search(TEST_RESULTS_REGEX, out)
+
+    if results is None:
+        return None
+
+    return {name: int(results.group(name)) for name in ("testsRun", "errors", "failures", "skipped")}
+
 def _make_argparse():
     parser = argparse.ArgumentParser(description="Runs the XPlane2Blender test suite")
     test_selection = parser.add_argument_group("Test Selection And Control")
@@ -65,6 +167,14 @@ def _make_argparse():
     blender_options.add_argument("-n", "--no-factory-startup",
             help="Run Blender with current prefs rather than factory prefs",
             action="store_true")
+    blender_options.add_argument("--persistent",
+            default=False,
+            help="Run all test files in one long-lived Blender instead of starting Blender for each file",
+            action="store_true")
+    blender_options.add_argument("-j", "--jobs",
+            default=1,
+            help="Number of test files to run at the same time, each in its own Blender",
+            type=int)
     return parser
 
 def main(argv=None)->int:
@@ -73,16 +183,6 @@ def main(argv=None)->int:
     '''
     exit_code = 0
 
-    """
-    Rather than mess with fancy ways to pass back test results
-    we have a stupid simple solution: Print a special string
-    at the end and parse it here.
-
-    Unfortunately, the REGEX must be duplicated across both files
-    due to some problems with importing it from the test module
-    """
-    TEST_RESULTS_REGEX = re.compile(r"RESULT: After (?P<testsRun>\d+) tests got (?P<errors>\d+) errors, (?P<failures>\d+) failures, and (?P<skipped>\d+) skipped")
-
     # Accumulated TestResult stats, reported at the end of everything
     total_testsCompleted, total_errors, total_failures, total_skipped = (0,) * 4
     timer_start = time.perf_counter()
@@ -139,89 +239,131 @@ def main(argv=None)->int:
 
         return passes
 
-    exit_code = 0
+    # Collected up front, so the results can be printed in this order
+    # no matter which job finishes first
+    test_files = [] # type: List[Tuple[str, Optional[str]]]
     for root, dirs, files in os.walk('./tests'):
-        filtered_files = list(filter(lambda file: file.endswith('.test.py') and
-                                     inFilter(os.path.join(root, file)),
-                                     files))
-        if exit_code != 0:
-            break
+        for file in files:
+            pyFile = os.path.join(root, file)
+            if file.endswith('.test.py') and inFilter(pyFile):
+                blendFile = pyFile.replace('.py', '.blend')
+                test_files.append((pyFile, blendFile if os.path.exists(blendFile) else None))
+
+    jobs = max(1, argv.jobs)
+
+    # With more than one job each gets its own folder in ./tests/tmp,
+    # passed on to the tests through TMP_DIR_ENV_VAR
+    job_envs = [] # type: List[Optional[Dict[str,str]]]
+    free_jobs = queue.Queue() # type: queue.Queue
+    for job in range(jobs):
+        env = None
+        if jobs > 1:
+            tmp_dir = os.path.abspath(os.path.join('./tests/tmp', 'job_%d' % job))
+            os.makedirs(tmp_dir, exist_ok=True)
+            env = dict(os.environ)
+            env[TMP_DIR_ENV_VAR] = tmp_dir
+
+        job_envs.append(env)
+        free_jobs.put(job)
+
+    workers = {} # type: Dict[int, BlenderWorker]
+
+    # Index of the first test file in test_files known to fail, files after it
+    # are not started unless --continue is used
+    first_failure = [len(test_files)]
+    first_failure_lock = threading.Lock()
+
+    def runTestFile(index:int)->Optional[Tuple[str, Optional[Dict[str,int]]]]:
+        with first_failure_lock:
+            if index > first_failure[0]:
+                return None
+
+        pyFile, blendFile = test_files[index]
+        job = free_jobs.get()
+        try:
+            if argv.persistent:
+                worker = workers.get(job)
+                if worker is None or not worker.is_alive():
+                    worker = workers[job] = BlenderWorker(argv, job_envs[job])
+
+                out, results = worker.run(pyFile, blendFile)
+            else:
+                blender_args = _make_blender_args(argv)
 
-        for pyFile in filtered_files:
-            if exit_code != 0:
-                break
+                if blendFile:
+                    blender_args.append(blendFile)
 
-            pyFile = os.path.join(root, pyFile)
-            blendFile = pyFile.replace('.py', '.blend')
+                blender_args.extend(['--python', pyFile])
 
-            if not (argv.quiet or argv.print_fails):
-                printTestBeginning("Running file " + pyFile)
+                if argv.force_blender_debug:
+                    blender_args.append('--debug')
 
-            blender_args = [
-                argv.blender,
-                '--addons',
-                'io_xplane2blender',
-                '--factory-startup',
-                '-noaudio',
-                '-b'
-            ]
+                # Small Hack!
+                # Blender stops parsing after '--', so we can append the test runner
+                # args and bridge the gap without anything fancy!
+                blender_args.extend(['--']+sys.argv[1:])
 
-            if argv.no_factory_startup:
-                blender_args.remove('--factory-startup')
+                if (not argv.quiet and
+                        (argv.force_blender_debug or argv.force_xplane_debug)):
+                    # print the command used to execute the script
+                    # to be able to easily re-run it manually to get better error output
+                    print(' '.join(blender_args))
 
-            if os.path.exists(blendFile):
-                blender_args.append(blendFile)
-            else:
-                if not (argv.quiet or argv.print_fails):
-                    print("WARNING: Blender file " + blendFile + " does not exist")
-                    printTestEnd()
+                #Run Blender, normalize output line endings because Windows is dumb
+                out = subprocess.check_output(blender_args, stderr = subprocess.STDOUT, universal_newlines=True, env=job_envs[job]) # type: str
+                results = _parse_results(out)
+        finally:
+            free_jobs.put(job)
 
-            blender_args.extend(['--python', pyFile])
+        if not argv.keep_going and (results is None or results['errors'] or results['failures']):
+            with first_failure_lock:
+                first_failure[0] = min(first_failure[0], index)
 
-            if argv.force_blender_debug:
-                blender_args.append('--debug')
+        return out, results
 
-            # Small Hack!
-            # Blender stops parsing after '--', so we can append the test runner
-            # args and bridge the gap without anything fancy!
-            blender_args.extend(['--']+sys.argv[1:])
+    exit_code = 0
+    with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as executor:
+        futures = [executor.submit(runTestFile, index) for index in range(len(test_files))]
 
-            if (not argv.quiet and
-                    (argv.force_blender_debug or argv.force_xplane_debug)):
-                # print the command used to execute the script
-                # to be able to easily re-run it manually to get better error output
-                print(' '.join(blender_args))
+        for (pyFile, blendFile), future in zip(test_files, futures):
+            if exit_code != 0:
+                break
+
+            if not (argv.quiet or argv.print_fails):
+                printTestBeginning("Running file " + pyFile)
+
+            if blendFile is None:
+                if not (argv.quiet or argv.print_fails):
+                    print("WARNING: Blender file " + pyFile.replace('.py', '.blend') + " does not exist")
+                    printTestEnd()
+
+            out, results = future.result()
 
-            #Run Blender, normalize output line endings because Windows is dumb
-            out = subprocess.check_output(blender_args, stderr = subprocess.STDOUT, universal_newlines=True) # type: str
             if not (argv.quiet or argv.print_fails):
                 print(out)
 
             # TestResults from the current test
             testsRun, errors, failures, skipped = (0,) * 4
             try:
-                results = re.search(TEST_RESULTS_REGEX, out)
-            except:
-                # Oh goodie, more string matching!
-                # I'm sure this won't ever come back to bite us!
-                # If we're ever using assertRaises,
-                # hopefully we'll figure out something better! -Ted, 8/14/18
-                assert results is not None or "Traceback" in out, \
-                        "Test runner must print correct results string at end or have suffered an unrecoverable error"
-                total_errors += 1
-                errors = 1
-            else:
-                testsRun, errors, failures, skipped = (
-                    int(results.group('testsRun')),
-                    int(results.group('errors')),
-                    int(results.group('failures')),
-                    int(results.group('skipped'))
-                )
-
-                total_testsCompleted += testsRun
-                total_errors         += errors
-                total_failures       += failures
-                total_skipped        += skipped
+                if results is None:
+                    # Oh goodie, more string matching!
+                    # I'm sure this won't ever come back to bite us!
+                    # If we're ever using assertRaises,
+                    # hopefully we'll figure out something better! -Ted, 8/14/18
+                    total_errors += 1
+                    errors = 1
+                else:
+                    testsRun, errors, failures, skipped = (
+                        results['testsRun'],
+                        results['errors'],
+                        results['failures'],
+                        results['skipped']
+                    )
+
+                    total_testsCompleted += testsRun
+                    total_errors         += errors
+                    total_failures       += failures
+                    total_skipped        += skipped
             finally:
                 if errors or failures:
                     if argv.print_fails:
@@ -245,6 +387,9 @@ def main(argv=None)->int:
                 if not (argv.quiet or argv.print_fails):
                     printTestEnd()
 
+    for worker in workers.values():
+        worker.close()
+
     # Final Result String Benifits
     # - --continue concisely tells how many tests failed
     # - Just enough more info for --quiet
@@ -69,4 +69,27 @@ class TestInstantExportFromMenu(XPlaneTestCase):
         #Check if file exists
         self.assert_file_exists(8, os.path.join(EXPORT_FOLDER,"ensure","dot", "paths","resolve","filename.obj"))
 
+    def test_export_resets_min_level(self):
+        debug = bpy.context.scene.xplane.debug
+        bpy.context.scene.xplane.debug = False
+        try:
+            self.assert_file_exists(0,os.path.join(EXPORT_FOLDER, "ensure_append.obj"))
+        finally:
+            bpy.context.scene.xplane.debug = debug
+
+        self.assertTrue(logger.isEnabledFor('info'))
+
+    def test_summary_logged_without_debug(self):
+        debug = bpy.context.scene.xplane.debug
+        bpy.context.scene.xplane.debug = False
+        try:
+            self.assert_file_exists(0,os.path.join(EXPORT_FOLDER, "ensure_append.obj"))
+        finally:
+            bpy.context.scene.xplane.debug = debug
+
+        summaries = [message['message'] for message in logger.findOfType('success')
+                     if message['message'].endswith(' unchanged file(s)')]
+        self.assertEqual(len(summaries), 1)
+        self.assertEqual(summaries[0].count('1 file(s)'), 1)
+
 runTestCases([TestInstantExportFromMenu])
\ No newline at end of file
@@ -0,0 +1,93 @@
+import bpy
+import os
+import sys
+from io_xplane2blender.tests import *
+from io_xplane2blender import xplane_change_tracker
+
+__dirname__ = os.path.dirname(__file__)
+
+class TestReexportChanged(XPlaneTestCase):
+    def setUp(self):
+        super(TestReexportChanged, self).setUp()
+        xplane_change_tracker.markClean()
+
+    def tearDown(self):
+        xplane_change_tracker.markEverythingChanged()
+
+    def test_object_change_is_tracked(self):
+        cube = bpy.data.objects['Cube']
+        cube.location.x += 1
+        bpy.context.scene.update()
+
+        self.assertIn('Cube', xplane_change_tracker.changedObjectNames)
+        self.assertTrue(xplane_change_tracker.isLayerChanged(0, [cube]))
+        self.assertFalse(xplane_change_tracker.isLayerChanged(0, [bpy.data.objects['Camera']]))
+
+    def test_paused_changes_are_ignored(self):
+        xplane_change_tracker.pause()
+        bpy.data.objects['Cube'].location.x += 1
+        bpy.context.scene.update()
+        xplane_change_tracker.resume()
+
+        self.assertNotIn('Cube', xplane_change_tracker.changedObjectNames)
+
+    def test_root_object_changed_by_descendant(self):
+        cube = bpy.data.objects['Cube']
+        bpy.data.objects['Lamp'].parent = cube
+        xplane_change_tracker.markClean()
+
+        xplane_change_tracker.changedObjectNames.add('Lamp')
+
+        self.assertTrue(xplane_change_tracker.isRootObjectChanged(cube))
+        self.assertFalse(xplane_change_tracker.isRootObjectChanged(bpy.data.objects['Camera']))
+
+    def test_layer_move_changes_old_layer(self):
+        cube = bpy.data.objects['Cube']
+        cube.layers[1] = True
+        cube.layers[0] = False
+        cube.location.x += 1
+        bpy.context.scene.update()
+
+        self.assertTrue(xplane_change_tracker.isLayerChanged(0, [bpy.data.objects['Camera'], bpy.data.objects['Lamp']]))
+        self.assertTrue(xplane_change_tracker.isLayerChanged(1, [cube]))
+        self.assertFalse(xplane_change_tracker.isLayerChanged(2, []))
+
+        cube.layers[0] = True
+        cube.layers[1] = False
+
+    def test_reparent_changes_old_root(self):
+        cube = bpy.data.objects['Cube']
+        camera = bpy.data.objects['Camera']
+        lamp = bpy.data.objects['Lamp']
+        lamp.parent = cube
+        xplane_change_tracker.markClean()
+
+        lamp.parent = camera
+        lamp.location.x += 1
+        bpy.context.scene.update()
+
+        self.assertIn('Lamp', xplane_change_tracker.changedObjectNames)
+        self.assertTrue(xplane_change_tracker.isRootObjectChanged(cube))
+        self.assertTrue(xplane_change_tracker.isRootObjectChanged(camera))
+
+        lamp.parent = None
+
+    def test_renamed_change_is_tracked(self):
+        cube = bpy.data.objects['Cube']
+        cube.location.x += 1
+        bpy.context.scene.update()
+        cube.name = 'Cube_renamed'
+
+        self.assertTrue(xplane_change_tracker.isLayerChanged(0, [cube]))
+        self.assertTrue(xplane_change_tracker.isRootObjectChanged(cube))
+        self.assertFalse(xplane_change_tracker.isRootObjectChanged(bpy.data.objects['Camera']))
+
+        cube.name = 'Cube'
+
+    def test_everything_changed(self):
+        xplane_change_tracker.markEverythingChanged()
+
+        self.assertTrue(xplane_change_tracker.isLayerChanged(0, []))
+        self.assertTrue(xplane_change_tracker.isRootObjectChanged(bpy.data.objects['Camera']))
+
+runTestCases([TestReexportChanged])
@@ -4,6 +4,7 @@ import sys
 from io_xplane2blender.tests import *
 from io_xplane2blender.xplane_config import getDebug
 from io_xplane2blender.xplane_types import xplane_file
+from io_xplane2blender.xplane_types.xplane_header import COMPOSITE_MANIFEST_EXTENSION
 from hashlib import md5
 
 __dirname__ = os.path.dirname(__file__)
@@ -28,12 +29,15 @@ class TestTextureComposition(XPlaneTestCase):
     def move_image_for_manual_comparison(self, blenderTexPath, tmpTexPath):
          # move to tmp dir for manual investigation
         os.rename(blenderTexPath, tmpTexPath)
+        os.replace(blenderTexPath + COMPOSITE_MANIFEST_EXTENSION, tmpTexPath + COMPOSITE_MANIFEST_EXTENSION)
         
         print("Manually inspect blender image %s with generated image %s" % (blenderTexPath,tmpTexPath))
     
     #TODO: Is this needed?
     #Assert that the modification is the same
-    def do_modified_time_test(self,blenderTexPath,layer_index, filename):
+    def do_modified_time_test(self,blenderTexPath,layer_index, filename, sourceTexNames):
+        self.assertTrue(os.path.exists(blenderTexPath + COMPOSITE_MANIFEST_EXTENSION), 'Composite manifest was not written.')
+
         # store modification time of composed texture
         blenderTexTime = os.path.getmtime(blenderTexPath)
 
@@ -42,6 +46,21 @@ class TestTextureComposition(XPlaneTestCase):
 
         self.assertTrue(os.path.exists(blenderTexPath))
         self.assertEqual(blenderTexTime, os.path.getmtime(blenderTexPath))
+
+        # sources with the same content but newer mtimes, like after a fresh checkout.
+        # They are committed fixtures, so their times are restored afterwards
+        sourceTexPaths = [os.path.join(__dirname__, 'tex', sourceTexName) for sourceTexName in sourceTexNames]
+        sourceTexTimes = [(os.stat(path).st_atime_ns, os.stat(path).st_mtime_ns) for path in sourceTexPaths]
+
+        try:
+            for sourceTexPath in sourceTexPaths:
+                os.utime(sourceTexPath, (blenderTexTime + 10, blenderTexTime + 10))
+
+            self.exportLayer(layer_index, filename)
+            self.assertEqual(blenderTexTime, os.path.getmtime(blenderTexPath))
+        finally:
+            for sourceTexPath, sourceTexTime in zip(sourceTexPaths, sourceTexTimes):
+                os.utime(sourceTexPath, ns = sourceTexTime)
         
     def test_texture_composition_nm_spec_export(self):
         def filterLines(line):
@@ -62,7 +81,7 @@ class TestTextureComposition(XPlaneTestCase):
         self.assertTrue(os.path.exists(blenderNormSpecTexPath), 'Normal+Specular texture was not generated.')
         self.assertEqual(self.checksum(blenderNormSpecTexPath), self.checksum(fixtureNormSpecTexPath), 'Image files are not equal.')
 
-        self.do_modified_time_test(blenderNormSpecTexPath,0,filename)
+        self.do_modified_time_test(blenderNormSpecTexPath,0,filename,('normal.png', 'specular.png'))
         self.move_image_for_manual_comparison(blenderNormSpecTexPath,tmpNormSpecTexPath)
 
     def test_texture_composition_nm_export(self):
@@ -84,7 +103,7 @@ class TestTextureComposition(XPlaneTestCase):
         self.assertTrue(os.path.exists(blenderNormWithAlphaTexPath), 'Normal w/ alpha texture was not generated.')
         self.assertEqual(self.checksum(blenderNormWithAlphaTexPath), self.checksum(fixtureAlphaTexPath), 'Image files are not equal.')
 
-        self.do_modified_time_test(blenderNormWithAlphaTexPath,1,filename)
+        self.do_modified_time_test(blenderNormWithAlphaTexPath,1,filename,('normal_with_alpha.png',))
 
         # move to tmp dir for manual investigation
         self.move_image_for_manual_comparison(blenderNormWithAlphaTexPath, tmpNormWithAlphaTexPath)
@@ -107,7 +126,7 @@ class TestTextureComposition(XPlaneTestCase):
         self.assertTrue(os.path.exists(blenderSpecTexPath), 'Specular spec texture was not generated.')
         self.assertEqual(self.checksum(blenderSpecTexPath), self.checksum(fixtureSpecTextPath), 'Image files are not equal.')
 
-        self.do_modified_time_test(blenderSpecTexPath,2,filename)
+        self.do_modified_time_test(blenderSpecTexPath,2,filename,('specular.png',))
         
         self.move_image_for_manual_comparison(blenderSpecTexPath, tmpSpecTexPath)
 
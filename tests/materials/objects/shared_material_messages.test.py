@@ -0,0 +1,46 @@
+import bpy
+import os
+import sys
+
+from io_xplane2blender.tests import *
+from io_xplane2blender.tests.test_creation_helpers import *
+from io_xplane2blender.xplane_types import xplane_file
+
+__dirname__ = os.path.dirname(__file__)
+
+class TestSharedMaterialMessages(XPlaneTestCase):
+    def setUp(self):
+        super(TestSharedMaterialMessages, self).setUp()
+        create_initial_test_setup()
+        set_xplane_layer(0, {'export_type': 'scenery'})
+
+    def test_invalid_material_reported_once(self):
+        create_material('Shared_Panel').xplane.panel = True
+        for name in ('shared_A', 'shared_B', 'shared_C'):
+            create_datablock_mesh(DatablockInfo('MESH', name = name), material_name = 'Shared_Panel')
+
+        xplane_file.createFileFromBlenderLayerIndex(0).write()
+
+        errors = logger.findErrors()
+        self.assertEqual(len(errors), 1)
+        self.assertTrue(errors[0]['message'].startswith('Material "Shared_Panel" in objects '))
+        self.assertTrue(errors[0]['message'].endswith(' Must not be part of the cockpit panel.'))
+        for name in ('shared_A', 'shared_B', 'shared_C'):
+            self.assertIn('"%s"' % name, errors[0]['message'])
+
+        logger.clearMessages()
+
+    def test_manipulator_validated_separately(self):
+        create_datablock_mesh(DatablockInfo('MESH', name = 'plain'), material_name = 'Shared')
+        create_datablock_mesh(DatablockInfo('MESH', name = 'manipulator'), material_name = 'Shared')
+        bpy.data.objects['manipulator'].xplane.manip.enabled = True
+
+        xplane_file.createFileFromBlenderLayerIndex(0).write()
+
+        errors = logger.findErrors()
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(errors[0]['message'], 'Material "Shared" in object "manipulator" Must not be a manipulator.')
+
+        logger.clearMessages()
+
+runTestCases([TestSharedMaterialMessages])
@@ -0,0 +1,69 @@
+import bpy
+import os
+import sys
+
+from io_xplane2blender.tests import *
+from io_xplane2blender import xplane_image_composer
+from io_xplane2blender.xplane_image_composer import combineSpecularAndNormal, getImageByFilepath, normalWithoutAlpha, specularToGrayscale
+
+__dirname__ = os.path.dirname(__file__)
+
+def create_image(name, pixels):
+    '''
+    Creates a 2x1 image from a list of 2 RGBA tuples
+    '''
+    image = bpy.data.images.new(name, 2, 1, alpha = True)
+    image.pixels[:] = [channel for pixel in pixels for channel in pixel]
+    return image
+
+def get_pixels(image):
+    pixels = image.pixels[:]
+    return [tuple(round(channel, 3) for channel in pixels[i:i+4]) for i in range(0, len(pixels), 4)]
+
+class TestImageComposer(XPlaneTestCase):
+    def setUp(self):
+        super(TestImageComposer, self).setUp()
+        self.normal = create_image('composer_normal', [(0.5, 0.25, 1.0, 0.0), (0.0, 1.0, 0.75, 0.5)])
+        self.specular = create_image('composer_specular', [(0.2, 0.3, 0.4, 0.5), (0.8, 0.7, 0.6, 0.0)])
+
+    def tearDown(self):
+        xplane_image_composer.stopImageIndex()
+
+    def test_composites(self):
+        image = normalWithoutAlpha(self.normal, 'composer_nm')
+        self.assertEqual(get_pixels(image), [(0.5, 0.25, 1.0, 1.0), (0.0, 1.0, 0.75, 1.0)])
+
+        image = specularToGrayscale(self.specular, 'composer_spec')
+        self.assertEqual(get_pixels(image), [(0.2, 0.3, 0.4, 1.0), (0.8, 0.7, 0.6, 1.0)])
+
+        image = combineSpecularAndNormal(self.specular, self.normal, 'composer_nm_spec')
+        self.assertEqual(get_pixels(image), [(0.5, 0.25, 1.0, 0.2), (0.0, 1.0, 0.75, 0.8)])
+
+    def test_get_image_by_filepath(self):
+        self.normal.filepath = '//tex/composer_normal.png'
+        blenddir = os.path.dirname(bpy.context.blend_data.filepath)
+
+        self.assertIs(getImageByFilepath('//tex/composer_normal.png'), self.normal)
+        self.assertIs(getImageByFilepath(os.path.abspath(os.path.join(blenddir, 'tex', 'composer_normal.png'))), self.normal)
+        self.assertIs(getImageByFilepath('//tex/../tex/composer_normal.png'), self.normal)
+        self.assertIsNone(getImageByFilepath('//tex/composer_missing.png'))
+        self.assertIsNone(getImageByFilepath(''))
+
+        # like the index, the scan returns the first image using the file
+        self.specular.filepath = '//tex/composer_normal.png'
+        self.assertIs(getImageByFilepath('//tex/composer_normal.png'), self.normal)
+
+    def test_image_index(self):
+        self.normal.filepath = '//tex/composer_indexed.png'
+        xplane_image_composer.startImageIndex()
+
+        self.assertIs(getImageByFilepath('//tex/composer_indexed.png'), self.normal)
+
+        # the index was built by the first lookup and must be told about new paths
+        self.specular.filepath = '//tex/composer_indexed_spec.png'
+        self.assertIsNone(getImageByFilepath('//tex/composer_indexed_spec.png'))
+
+        xplane_image_composer.indexImage(self.specular)
+        self.assertIs(getImageByFilepath('//tex/composer_indexed_spec.png'), self.specular)
+
+runTestCases([TestImageComposer])
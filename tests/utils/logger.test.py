@@ -0,0 +1,83 @@
+import bpy
+import os
+import sys
+
+from io_xplane2blender.tests import *
+from io_xplane2blender.xplane_helpers import XPlaneLogger
+
+__dirname__ = os.path.dirname(__file__)
+
+class Unformattable():
+    def __str__(self):
+        raise AssertionError("message below the minimum level was formatted")
+
+class TestXPlaneLogger(XPlaneTestCase):
+    def test_args_are_formatted(self):
+        log = XPlaneLogger()
+        received = []
+        log.addTransport(lambda messageType, message, context = None: received.append(message))
+
+        log.info("scanning %s: %d", "Cube", 3)
+        log.warn("100% literal")
+        log.error("%s failed", "Cube", context = "ctx")
+
+        self.assertEqual(received, ["scanning Cube: 3", "100% literal", "Cube failed"])
+        self.assertEqual(log.findErrors()[0]['context'], "ctx")
+
+    def test_min_level_drops_messages(self):
+        log = XPlaneLogger()
+        received = []
+        log.addTransport(lambda messageType, message, context = None: received.append(message))
+        log.setMinLevel('warning')
+
+        log.info("scanning %s", Unformattable())
+        log.success("wrote %s", Unformattable())
+        log.warn("warning")
+
+        self.assertEqual(received, ["warning"])
+        self.assertEqual(len(log.messages), 1)
+        self.assertFalse(log.isEnabledFor('info'))
+        self.assertTrue(log.isEnabledFor('error'))
+
+        log.setMinLevel(None)
+        log.info("info")
+        self.assertEqual(len(log.findInfos()), 1)
+
+    def test_counts(self):
+        log = XPlaneLogger()
+        self.assertFalse(log.hasErrors())
+        self.assertFalse(log.hasWarnings())
+
+        log.warn("warning")
+        self.assertTrue(log.hasWarnings())
+        self.assertFalse(log.hasErrors())
+
+        log.error("error")
+        log.error("error")
+        self.assertTrue(log.hasErrors())
+        self.assertEqual(len(log.findErrors()), 2)
+
+        log.clearMessages()
+        self.assertFalse(log.hasErrors())
+        self.assertFalse(log.hasWarnings())
+        self.assertEqual(log.findErrors(), [])
+
+    def test_buffered_internal_text_transport(self):
+        log = XPlaneLogger()
+        log.addTransport(XPlaneLogger.InternalTextTransport('logger_test.log', buffered = True))
+        text = bpy.data.texts['logger_test.log']
+
+        log.info("first")
+        log.warn("second")
+        self.assertEqual(text.as_string(), '')
+
+        log.flush()
+        self.assertEqual(text.as_string(), 'INFO: first\nWARNING: second\n')
+
+        log.info("third")
+        log.error("fourth")
+        self.assertEqual(text.as_string(), 'INFO: first\nWARNING: second\nINFO: third\nERROR: fourth\n')
+
+        bpy.data.texts.remove(text)
+
+runTestCases([TestXPlaneLogger])
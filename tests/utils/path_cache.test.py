@@ -0,0 +1,41 @@
+import bpy
+import os
+import sys
+
+from io_xplane2blender.tests import *
+from io_xplane2blender.xplane_helpers import getCanonicalPath, getRelativePath, pathCache
+
+__dirname__ = os.path.dirname(__file__)
+
+class TestPathCache(XPlaneTestCase):
+    def tearDown(self):
+        pathCache.stop()
+
+    def assertPathsResolved(self):
+        blenddir = os.path.abspath(os.path.join(__dirname__, 'scenery'))
+        exportdir = os.path.join(blenddir, 'objects')
+
+        self.assertEqual(getCanonicalPath('//tex/a.png', blenddir), os.path.join(blenddir, 'tex', 'a.png'))
+        self.assertEqual(getCanonicalPath('tex/../tex/a.png', blenddir), os.path.join(blenddir, 'tex', 'a.png'))
+        self.assertEqual(getCanonicalPath(os.path.join(blenddir, 'tex', 'a.png'), blenddir), os.path.join(blenddir, 'tex', 'a.png'))
+
+        self.assertEqual(getRelativePath('//tex/a.png', exportdir, blenddir), '../tex/a.png')
+        self.assertEqual(getRelativePath('//objects/b.pss', exportdir, blenddir), 'b.pss')
+        self.assertEqual(getRelativePath('//tex/a.png', blenddir, blenddir), 'tex/a.png')
+
+    def test_paths_without_cache(self):
+        self.assertPathsResolved()
+        self.assertEqual(pathCache.paths, {})
+
+    def test_paths_with_cache(self):
+        pathCache.start()
+        self.assertPathsResolved()
+        self.assertTrue(pathCache.paths)
+
+        # memoized results must not change
+        self.assertPathsResolved()
+
+        pathCache.stop()
+        self.assertEqual(pathCache.paths, {})
+
+runTestCases([TestPathCache])
@@ -86,4 +86,45 @@ class TestAnimations(XPlaneTestCase):
         self.assertFloatVectorsEqual(boneKeyframes[1].rotation[1], mathutils.Vector((-1.0, 0.0, 0.0)))
         self.assertEquals(boneKeyframes[1].rotationMode, 'AXIS_ANGLE')
 
+    def test_keyframe_frames_set_once(self):
+        framesSet = []
+
+        def recordFrame(scene):
+            framesSet.append(scene.frame_current)
+
+        bpy.app.handlers.frame_change_pre.append(recordFrame)
+        try:
+            xplaneFile = xplane_file.createFileFromBlenderLayerIndex(0)
+        finally:
+            bpy.app.handlers.frame_change_pre.remove(recordFrame)
+
+        armature = xplaneFile.rootBone.children[0]
+        cube = xplaneFile.rootBone.children[1]
+        bone = armature.children[0]
+
+        keyframeFrames = set()
+        for animatedBone in (bone, cube):
+            for keyframes in animatedBone.animations.values():
+                keyframeFrames.update(keyframe.frame for keyframe in keyframes)
+
+        # Once per distinct keyframe frame, plus restoring the frame after sampling and after collecting
+        self.assertEquals(len(framesSet), len(keyframeFrames) + 2)
+
+    def test_memoized_until_invalidated(self):
+        xplaneFile = xplane_file.createFileFromBlenderLayerIndex(0)
+        cube = xplaneFile.rootBone.children[1]
+
+        self.assertTrue(cube.isAnimated())
+        worldMatrix = cube.getBlenderWorldMatrix()
+        worldMatrix[0][3] += 10
+        self.assertNotEqual(cube.getBlenderWorldMatrix(), worldMatrix)
+
+        animations = cube.animations
+        cube.animations = {}
+        self.assertTrue(cube.isAnimated())
+
+        xplaneFile.rootBone.invalidateCache()
+        self.assertFalse(cube.isAnimated())
+        cube.animations = animations
+
 runTestCases([TestAnimations])
@@ -0,0 +1,39 @@
+import bpy
+import os
+import sys
+from io_xplane2blender.tests import *
+from io_xplane2blender.xplane_types.xplane_commands import XPlaneCommands
+
+__dirname__ = os.path.dirname(__file__)
+
+class TestAttributeCounterparts(XPlaneTestCase):
+    def setUp(self):
+        super(TestAttributeCounterparts, self).setUp()
+        self.commands = XPlaneCommands(None)
+
+    def test_setter_counterparts(self):
+        self.commands.written = {'ATTR_cockpit_region': True, 'ATTR_hard': True}
+        self.assertEqual(sorted(self.commands.getAttributeCounterparts('ATTR_cockpit')),
+                         ['ATTR_cockpit_region', 'ATTR_no_cockpit'])
+
+    def test_reseter_counterparts(self):
+        self.commands.written = {'ATTR_hard': True, 'ATTR_hard_deck': True, 'ATTR_blend': True}
+        self.assertEqual(sorted(self.commands.getAttributeCounterparts('ATTR_no_hard')),
+                         ['ATTR_hard', 'ATTR_hard_deck'])
+
+    def test_counterparts_follow_written(self):
+        self.commands.written = {}
+        self.assertEqual(self.commands.getAttributeCounterparts('ATTR_no_hard'), [])
+
+        self.commands.written = {'ATTR_hard': True}
+        self.assertEqual(self.commands.getAttributeCounterparts('ATTR_no_hard'), ['ATTR_hard'])
+
+    def test_add_reseter_after_use(self):
+        self.commands.written = {'ATTR_custom': True}
+        self.assertEqual(self.commands.getAttributeCounterparts('ATTR_custom_reset'), [])
+
+        self.commands.addReseter('ATTR_custom', 'ATTR_custom_reset')
+        self.assertEqual(self.commands.getAttributeCounterparts('ATTR_custom_reset'), ['ATTR_custom'])
+        self.assertEqual(self.commands.getAttributeCounterparts('ATTR_custom'), ['ATTR_custom_reset'])
+
+runTestCases([TestAttributeCounterparts])
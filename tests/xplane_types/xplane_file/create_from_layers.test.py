@@ -86,4 +86,15 @@ class TestCreateFromLayers(XPlaneTestCase):
                                 '5 Mesh: Cube_Bone.001'
         ])
 
+    def test_create_files_from_layer_buckets(self):
+        layerIndexes = [0, 1, 2]
+        blenderObjectsByLayerIndex = xplane_file.getBlenderObjectsByLayerIndex(layerIndexes)
+
+        for layerIndex in layerIndexes:
+            expected = xplane_file.createFileFromBlenderLayerIndex(layerIndex)
+            xplaneFile = xplane_file.createFileFromBlenderLayerIndex(layerIndex, blenderObjectsByLayerIndex[layerIndex])
+
+            self.assertEqual(list(xplaneFile.objects.keys()), list(expected.objects.keys()))
+            self.assertEqual(xplaneFile.write(), expected.write())
+
 runTestCases([TestCreateFromLayers])
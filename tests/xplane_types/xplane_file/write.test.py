@@ -1,9 +1,12 @@
 import bpy
+import concurrent.futures
 import os
+import pickle
 import sys
 from io_xplane2blender.tests import *
 from io_xplane2blender.xplane_types import xplane_file
 from io_xplane2blender import xplane_config
+from io_xplane2blender.xplane_helpers import profiler
 
 __dirname__ = os.path.dirname(__file__)
 
@@ -23,4 +26,91 @@ class TestWriteXPlaneFiles(XPlaneTestCase):
         filename = 'test_write_transrot_anim'
         self.assertLayerExportEqualsFixture(2, os.path.join(__dirname__, 'fixtures', filename + '.obj'), filename)
 
+    def test_write_to_file_sink(self):
+        filename = 'test_write_transrot_anim'
+        xplaneFile = xplane_file.createFileFromBlenderLayerIndex(2)
+        self.assertTrue(xplaneFile.prepareWrite())
+
+        tmpPath = os.path.join(TMP_DIR, filename + '_write_to.obj')
+        with open(tmpPath, 'w') as tmp_file:
+            xplaneFile.writeTo(tmp_file)
+
+        with open(tmpPath, 'r') as tmp_file:
+            out = tmp_file.read()
+
+        self.assertFileOutputEqualsFixture(out, os.path.join(__dirname__, 'fixtures', filename + '.obj'))
+
+    def test_snapshot_equals_write(self):
+        expected = xplane_file.createFileFromBlenderLayerIndex(2).write()
+
+        xplaneFile = xplane_file.createFileFromBlenderLayerIndex(2)
+        self.assertTrue(xplaneFile.prepareWrite())
+        snapshot = xplaneFile.snapshot()
+
+        self.assertEqual(snapshot.write(), expected)
+
+    def test_snapshot_in_other_process(self):
+        expected = xplane_file.createFileFromBlenderLayerIndex(2).write()
+
+        xplaneFile = xplane_file.createFileFromBlenderLayerIndex(2)
+        self.assertTrue(xplaneFile.prepareWrite())
+        snapshot = xplaneFile.snapshot()
+
+        tmpPath = os.path.join(TMP_DIR, 'test_write_snapshot_process.obj')
+        with concurrent.futures.ProcessPoolExecutor(1) as pool:
+            written, seconds = pool.submit(xplane_file.writeSnapshot, snapshot, tmpPath, False).result()
+
+        self.assertTrue(written)
+        with open(tmpPath, 'r') as tmp_file:
+            self.assertEqual(tmp_file.read(), expected)
+
+    def test_snapshot_keeps_debug(self):
+        debug = xplane_config.getDebug()
+        try:
+            xplane_config.setDebug(False)
+            xplaneFile = xplane_file.createFileFromBlenderLayerIndex(2)
+            self.assertTrue(xplaneFile.prepareWrite())
+            snapshot = xplaneFile.snapshot()
+
+            # the snapshot is written without reading the scene
+            xplane_config.setDebug(True)
+            self.assertNotIn('\t# 0\n', pickle.loads(pickle.dumps(snapshot)).write())
+        finally:
+            xplane_config.setDebug(debug)
+
+    def test_snapshot_skips_unchanged_file(self):
+        xplaneFile = xplane_file.createFileFromBlenderLayerIndex(2)
+        self.assertTrue(xplaneFile.prepareWrite())
+        snapshot = xplaneFile.snapshot()
+
+        tmpPath = os.path.join(TMP_DIR, 'test_write_skip_unchanged.obj')
+        if os.path.exists(tmpPath):
+            os.remove(tmpPath)
+
+        self.assertTrue(snapshot.writeToFile(tmpPath, onlyIfChanged = True))
+        os.utime(tmpPath, (0, 0))
+
+        self.assertFalse(snapshot.writeToFile(tmpPath, onlyIfChanged = True))
+        self.assertEqual(os.path.getmtime(tmpPath), 0)
+        self.assertFalse(os.path.exists(tmpPath + '.tmp'))
+
+        self.assertTrue(snapshot.writeToFile(tmpPath))
+        self.assertNotEqual(os.path.getmtime(tmpPath), 0)
+
+    def test_profiled_write(self):
+        profiler.start(True)
+        try:
+            xplaneFile = xplane_file.createFileFromBlenderLayerIndex(2)
+            out = xplaneFile.write()
+        finally:
+            profiler.stop()
+
+        self.assertFalse(profiler.enabled)
+        report = profiler.report()
+        self.assertEqual(list(report['files'].keys()), [xplaneFile.filename])
+        for phase in ('collection', 'keyframe sampling', 'mesh', 'material validation', 'header', 'serialization', 'commands'):
+            self.assertIn(phase, report['phases'])
+
+        self.assertFileOutputEqualsFixture(out, os.path.join(__dirname__, 'fixtures', 'test_write_transrot_anim.obj'))
+
 runTestCases([TestWriteXPlaneFiles])
@@ -0,0 +1,41 @@
+import bpy
+import os
+import sys
+from io_xplane2blender.tests import *
+from io_xplane2blender.xplane_types.xplane_mesh import XPlaneMesh
+
+__dirname__ = os.path.dirname(__file__)
+
+class TestDupliVerticeIndex(XPlaneTestCase):
+    def setUp(self):
+        super(TestDupliVerticeIndex, self).setUp()
+        self.mesh = XPlaneMesh()
+        self.a = [0.0, 1.0, 2.0, 0.0, 1.0, 0.0, 0.5, 0.5]
+        self.b = [1.0, 1.0, 2.0, 0.0, 1.0, 0.0, 0.5, 0.5]
+
+    def test_finds_first_duplicate(self):
+        self.mesh.vertices.extend([list(self.a), list(self.b), list(self.a)])
+        self.assertEqual(self.mesh.getDupliVerticeIndex(list(self.a)), 0)
+        self.assertEqual(self.mesh.getDupliVerticeIndex(list(self.b)), 1)
+        self.assertEqual(self.mesh.getDupliVerticeIndex([9.0] * 8), -1)
+
+    def test_respects_start_index(self):
+        self.mesh.vertices.extend([list(self.a), list(self.b), list(self.a)])
+        self.assertEqual(self.mesh.getDupliVerticeIndex(list(self.a), 1), 2)
+        self.assertEqual(self.mesh.getDupliVerticeIndex(list(self.b), 2), -1)
+        self.assertEqual(self.mesh.getDupliVerticeIndex(list(self.a), 0), 0)
+
+    def test_sees_vertices_appended_between_lookups(self):
+        self.assertEqual(self.mesh.getDupliVerticeIndex(list(self.a)), -1)
+        self.mesh.vertices.append(list(self.a))
+        self.assertEqual(self.mesh.getDupliVerticeIndex(list(self.a)), 0)
+        self.mesh.vertices.append(list(self.b))
+        self.assertEqual(self.mesh.getDupliVerticeIndex(list(self.b)), 1)
+
+    def test_negative_zero_matches_zero(self):
+        self.mesh.vertices.append(list(self.a))
+        c = list(self.a)
+        c[0] = -0.0
+        self.assertEqual(self.mesh.getDupliVerticeIndex(c), 0)
+
+runTestCases([TestDupliVerticeIndex])
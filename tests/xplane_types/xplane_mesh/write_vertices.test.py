@@ -0,0 +1,57 @@
+import bpy
+import os
+import sys
+from io_xplane2blender.tests import *
+from io_xplane2blender import xplane_config
+from io_xplane2blender.xplane_types.xplane_mesh import XPlaneMesh
+
+__dirname__ = os.path.dirname(__file__)
+
+class TestWriteVertices(XPlaneTestCase):
+    def setUp(self):
+        super(TestWriteVertices, self).setUp()
+        self.mesh = XPlaneMesh()
+        self.mesh.vertices = [
+            [0.5, 1.0, -0.0, 10.0, 0.1, 100.0, 0.0, 0.00000001],
+            [1e-9, -1e-9, 123.456, -2.5, 0.25, -0.125, 1.0, 0.0]
+        ]
+
+    def tearDown(self):
+        xplane_config.setDebug(False)
+
+    def test_trailing_zeros_stripped(self):
+        xplane_config.setDebug(False)
+        self.assertEqual(self.mesh.writeVertices(),
+            "VT\t0.5\t1\t-0\t10\t0.1\t100\t0\t0.00000001\n"
+            "VT\t0\t-0\t123.45600128\t-2.5\t0.25\t-0.125\t1\t0\n")
+
+    def test_trailing_zeros_stripped_debug(self):
+        xplane_config.setDebug(True)
+        self.assertEqual(self.mesh.writeVertices(),
+            "VT\t0.5\t1\t-0\t10\t0.1\t100\t0\t0.00000001\t# 0\n"
+            "VT\t0\t-0\t123.45600128\t-2.5\t0.25\t-0.125\t1\t0\t# 1\n")
+
+    def test_debug_argument_overrides_scene(self):
+        xplane_config.setDebug(False)
+        self.assertEqual(self.mesh.writeVertices(True),
+            "VT\t0.5\t1\t-0\t10\t0.1\t100\t0\t0.00000001\t# 0\n"
+            "VT\t0\t-0\t123.45600128\t-2.5\t0.25\t-0.125\t1\t0\t# 1\n")
+
+    def test_debug_index_keeps_zeros(self):
+        xplane_config.setDebug(True)
+        self.mesh.vertices = [[float(i)] * 8 for i in range(11)]
+        self.assertTrue(self.mesh.writeVertices().endswith("VT" + "\t10" * 8 + "\t# 10\n"))
+
+    def test_more_rows_than_one_chunk(self):
+        xplane_config.setDebug(False)
+        self.mesh.vertices = [[float(i), 0.5, 0.0, 0.0, 1.0, 0.0, 0.25, 0.75] for i in range(2500)]
+        lines = self.mesh.writeVertices().splitlines()
+        self.assertEqual(len(lines), 2500)
+        self.assertEqual(lines[0], "VT\t0\t0.5\t0\t0\t1\t0\t0.25\t0.75")
+        self.assertEqual(lines[-1], "VT\t2499\t0.5\t0\t0\t1\t0\t0.25\t0.75")
+
+    def test_empty(self):
+        self.mesh.vertices = []
+        self.assertEqual(self.mesh.writeVertices(), "")
+
+runTestCases([TestWriteVertices])
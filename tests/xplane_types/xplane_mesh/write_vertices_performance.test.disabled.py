@@ -0,0 +1,72 @@
+import array
+import os
+import random
+import struct
+import sys
+import time
+
+import bpy
+from io_xplane2blender.tests import *
+from io_xplane2blender import xplane_config
+from io_xplane2blender.xplane_types.xplane_mesh import XPlaneMesh
+
+__dirname__ = os.path.dirname(__file__)
+
+NUM_VERTICES = 1000000
+
+def writeVerticesPerComponent(vertices, debug):
+    '''
+    XPlaneMesh.writeVertices as it was before formatting whole chunks,
+    kept here as the reference to compare output and speed against
+    '''
+    o = bytearray()
+    vt_array = array.array('f', [round(component,8) for vertice in vertices for component in vertice])
+    for i,line in enumerate(range(0,len(vt_array),8)):
+        o += b"VT"
+        for component in vt_array[line:line+8]:
+            sb = bytes("\t%.8f" % component,"utf-8").rstrip(b'0')
+            if sb[-1] == 46:#'.':
+                o += sb[:-1]
+            else:
+                o += sb
+
+        if debug:
+            o += bytes("\t# %d\n" % i,"utf-8")
+        else:
+            o += b"\n"
+
+    return o.decode("utf-8")
+
+class TestWriteVerticesPerformance(XPlaneTestCase):
+    def test_write_vertices_performance(self):
+        xplane_config.setDebug(False)
+
+        # Vertices always come out of Blender as float32s,
+        # half of them with some round (0, 1, 0.5) values
+        toFloat32 = lambda f: struct.unpack('f', struct.pack('f', f))[0]
+        rand = random.Random(0)
+        mesh = XPlaneMesh()
+        mesh.vertices = [
+            [toFloat32(rand.uniform(-50, 50)), toFloat32(rand.uniform(-50, 50)), toFloat32(rand.uniform(-50, 50)),
+             toFloat32(rand.uniform(-1, 1)), toFloat32(rand.uniform(-1, 1)), toFloat32(rand.uniform(-1, 1)),
+             toFloat32(rand.random()), toFloat32(rand.random())]
+            if i % 2 else
+            [float(i % 7), 0.5, 0.0, 0.0, 1.0, 0.0, 0.25, 1.0]
+            for i in range(NUM_VERTICES)
+        ]
+
+        start = time.perf_counter()
+        expected = writeVerticesPerComponent(mesh.vertices, False)
+        perComponentTime = time.perf_counter() - start
+
+        start = time.perf_counter()
+        out = mesh.writeVertices()
+        chunkedTime = time.perf_counter() - start
+
+        print("writeVertices of {} vertices: per component {:.3f}s, chunked {:.3f}s ({:.1f}x)".format(
+            NUM_VERTICES, perComponentTime, chunkedTime, perComponentTime / chunkedTime))
+
+        self.assertEqual(out, expected)
+        self.assertLess(chunkedTime, perComponentTime)
+
+runTestCases([TestWriteVerticesPerformance])